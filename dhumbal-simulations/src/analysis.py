@@ -0,0 +1,61 @@
+import numpy as np
+
+from cards import Result
+
+
+def final_positions(columns, num_players):
+    # Final position of every (game, player) pair, ranked like MonteCarlo.analyze_results: more rounds
+    # played first, then fewer cumulative points, then more points in the last round, then seating order.
+    # Returns the pairs' game, player and position arrays, sorted by game then player.
+    game = np.asarray(columns['game'], dtype=np.int64)
+    player = np.asarray(columns['player'], dtype=np.int64)
+    key = game * num_players + player
+    order = np.argsort(key, kind='stable')  # each pair's rows stay in round order
+    sorted_key = key[order]
+    starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]]) if len(key) else np.zeros(0, dtype=np.int64)
+    ends = np.r_[starts[1:], len(key)]
+
+    first_row = order[starts]
+    last_row = order[ends - 1]
+    pair_game = game[first_row]
+    pair_player = player[first_row]
+    rounds_played = ends - starts
+    final_points = np.asarray(columns['cumulative'], dtype=np.int64)[last_row]
+    last_round_points = np.asarray(columns['points'], dtype=np.int64)[last_row]
+
+    ranking = np.lexsort((first_row, -last_round_points, final_points, -rounds_played, pair_game))
+    ranked_game = pair_game[ranking]
+    group_start = np.flatnonzero(np.r_[True, ranked_game[1:] != ranked_game[:-1]]) if len(ranking) else np.zeros(0, dtype=np.int64)
+    group_sizes = np.diff(np.r_[group_start, len(ranking)])
+    positions = np.empty(len(ranking), dtype=np.int64)
+    positions[ranking] = np.arange(len(ranking)) - np.repeat(group_start, group_sizes) + 1
+    return pair_game, pair_player, positions
+
+
+def analyze_columns(columns, player_names):
+    # Vectorized MonteCarlo.analyze_results over flat ResultStore-layout columns.
+    # Returns (player_stats, player_statistics) in the MonteCarlo layout; per-round lists are NumPy arrays
+    # and outcomes are Result codes.
+    player = np.asarray(columns['player'])
+    points = np.asarray(columns['points'], dtype=np.int64)
+    codes = np.asarray(columns['result'])
+    _, pair_player, positions = final_positions(columns, len(player_names))
+    outcomes = list(Result)
+
+    # Players in order of first appearance, like the dict insertion order of the loop version
+    seen, first_seen = np.unique(player, return_index=True)
+    player_stats, player_statistics = {}, {}
+    for index in seen[np.argsort(first_seen)]:
+        name = player_names[index]
+        rows = player == index
+        scores = points[rows]
+        player_codes = codes[rows]
+        player_stats[name] = {'scores': scores, 'outcomes': player_codes, 'positions': positions[pair_player == index]}
+
+        present, first_code = np.unique(player_codes, return_index=True)
+        counts = np.bincount(player_codes, minlength=len(outcomes))
+        total_games = len(scores)
+        player_statistics[name] = {'mean_score': np.mean(scores), 'std_deviation': np.std(scores), 'variance': np.var(scores),
+                                   'outcome_percentages': {outcomes[code]: (int(counts[code]) / total_games) * 100
+                                                           for code in present[np.argsort(first_code)]}}
+    return player_stats, player_statistics
@@ -0,0 +1,267 @@
+import numpy as np
+
+from cards import CARD_POOL, CARD_RANK, NUM_RANKS, Result, card_pool
+from player import DiscardBiggestStrategy, MinimizeCardNumberStrategy
+from result_store import COLUMNS
+
+# Ranks of the cards in a fresh Deck: ONE..TWELVE in every suit plus two jokers (rank 0).
+# Suits never influence a move, so the batch engine only tracks ranks.
+DECK_RANKS = np.array([CARD_RANK[card.code] for card in CARD_POOL], dtype=np.int8)
+RANK_SCORES = np.minimum(np.arange(NUM_RANKS), 10).astype(np.int16)  # same min(rank, 10) rule as Player.calculate_score
+NO_POOLING = NUM_RANKS  # try_to_pool_threshold that no graveyard card can reach
+DHUMBAL_PENALTY = 20
+TURN_LIMIT = 100
+
+
+class BatchGame:
+    # Plays many games of Dhumbal in lockstep, mirroring Game/Player/Scoreboard with NumPy arrays:
+    # decks and graveyards are (games, cards) rank stacks, hands are (games, seats, ranks) counts.
+    # Every step makes one move in each unfinished game, so per-move Python overhead is shared
+    # by the whole batch. Dealt the same seatings and decks, it plays the same games as Game, but
+    # its shuffles all come from self.rng, not game_rng(seed, index): a seed gives other games than
+    # MonteCarlo.run_simulation does.
+    def __init__(self, players, num_games, seed=None, reshuffle_refills=False, hand_size=5, decks=1, jokers=2,
+                 elimination_score=108):
+        self.players = players
+        self.num_games = num_games
+        self.num_seats = len(players)
+        self.rng = np.random.default_rng(seed)
+        # Table rules, as in Game
+        self.reshuffle_refills = reshuffle_refills
+        self.hand_size = hand_size
+        self.elimination_score = elimination_score
+        pool = card_pool(decks, jokers)
+        self.deck_ranks = DECK_RANKS if pool is CARD_POOL else np.array([CARD_RANK[card.code] for card in pool], dtype=np.int8)
+        if self.num_seats * hand_size + 2 > len(self.deck_ranks):
+            raise ValueError(f"{len(self.deck_ranks)} cards cannot deal {hand_size} to each of {self.num_seats} players"
+                             f" and leave two to draw; use more decks")
+
+        policies = np.array([self.policy_parameters(player.strategy) for player in players], dtype=np.int16).reshape(-1, 3)
+        self.dhumbal_threshold, self.draw_graveyard_threshold, self.try_to_pool_threshold = policies.T
+
+    @staticmethod
+    def policy_parameters(strategy):
+        # DiscardBiggestStrategy is MinimizeCardNumberStrategy that never tries to pool
+        if isinstance(strategy, MinimizeCardNumberStrategy):
+            return strategy.dhumbal_threshold, strategy.draw_graveyard_threshold, strategy.try_to_pool_threshold
+        if isinstance(strategy, DiscardBiggestStrategy):
+            return strategy.dhumbal_threshold, strategy.draw_graveyard_threshold, NO_POOLING
+        raise TypeError(f"{type(strategy).__name__} has no vectorized policy")
+
+    @staticmethod
+    def supports(players):
+        # Whether every player's strategy has a vectorized policy
+        try:
+            for player in players:
+                BatchGame.policy_parameters(player.strategy)
+        except TypeError:
+            return False
+        return True
+
+    def run(self):
+        # Play all games and return their round logs in the MonteCarlo.results format
+        self.play()
+        return self.round_logs()
+
+    def play(self):
+        games, seats = self.num_games, self.num_seats
+        num_cards = len(self.deck_ranks)
+
+        # Game.__init__: shuffle the seating and pick the player the first round starts after
+        self.seat_player = self._new_seating(games)
+        self.starting_seat = self._new_starting_seats(games)
+        self.dt = self.dhumbal_threshold[self.seat_player]
+        self.dg = self.draw_graveyard_threshold[self.seat_player]
+        self.pool = self.try_to_pool_threshold[self.seat_player]
+
+        self.alive = np.ones((games, seats), dtype=bool)
+        self.cumulative = np.zeros((games, seats), dtype=np.int16)
+        self.hands = np.zeros((games, seats, NUM_RANKS), dtype=np.int8)
+        self.deck = np.zeros((games, num_cards), dtype=np.int8)
+        self.deck_size = np.zeros(games, dtype=np.int64)
+        self.graveyard = np.zeros((games, num_cards), dtype=np.int8)
+        self.graveyard_size = np.zeros(games, dtype=np.int64)
+        self.turn = np.zeros(games, dtype=np.int64)
+        self.moves_in_turn = np.zeros(games, dtype=np.int64)
+        self.mover = np.zeros(games, dtype=np.int64)
+        self.round = np.zeros(games, dtype=np.int64)
+        self.active = np.ones(games, dtype=bool)
+        self.round_records = []
+
+        self._start_rounds(np.arange(games), self.starting_seat)
+        while True:
+            idx = np.flatnonzero(self.active)
+            if len(idx) == 0:
+                break
+            self._step(idx)
+
+    def _new_seating(self, games):
+        return self.rng.permuted(np.tile(np.arange(self.num_seats), (games, 1)), axis=1)
+
+    def _new_starting_seats(self, games):
+        return self.rng.integers(0, self.num_seats, games)
+
+    def _new_decks(self, games):
+        # One freshly shuffled deck per game in `games`; the top of the deck is the last column
+        return self.rng.permuted(np.tile(self.deck_ranks, (len(games), 1)), axis=1)
+
+    def _refill_keys(self, games):
+        # Random sort keys in [0, 1), one per deck column, for the refill of each game in `games`
+        return self.rng.random((len(games), self.deck.shape[1]))
+
+    def _shuffle_refills(self, games):
+        # Shuffle the first deck_size cards of each game's deck: sorting random keys, with the unused
+        # tail of the row keyed past every real card, permutes only the recycled cards
+        keys = self._refill_keys(games)
+        keys[np.arange(self.deck.shape[1]) >= self.deck_size[games][:, None]] = 2
+        self.deck[games] = np.take_along_axis(self.deck[games], np.argsort(keys, axis=1), axis=1)
+
+    def _next_alive(self, idx, seats):
+        # Seat of the first alive player after `seats`, wrapping around the table
+        candidates = (seats[:, None] + 1 + np.arange(self.num_seats)) % self.num_seats
+        first = np.argmax(self.alive[idx[:, None], candidates], axis=1)
+        return candidates[np.arange(len(idx)), first]
+
+    def _start_rounds(self, idx, current_seats):
+        # Game.deal_cards for the games in `idx`: fresh deck, hand_size cards each in seating order, one to the graveyard
+        self.deck[idx] = self._new_decks(idx)
+        self.deck_size[idx] = self.deck.shape[1]
+        self.hands[idx] = 0
+        for _ in range(self.hand_size):
+            for seat in range(self.num_seats):
+                g = idx[self.alive[idx, seat]]
+                top = self.deck[g, self.deck_size[g] - 1]
+                self.hands[g, seat, top] += 1
+                self.deck_size[g] -= 1
+        self.graveyard[idx, 0] = self.deck[idx, self.deck_size[idx] - 1]
+        self.deck_size[idx] -= 1
+        self.graveyard_size[idx] = 1
+        self.turn[idx] = 0
+        self.moves_in_turn[idx] = 0
+        self.mover[idx] = self._next_alive(idx, current_seats)
+
+    def _step(self, idx):
+        seats = self.mover[idx]
+        hands = self.hands[idx, seats].astype(np.int16)
+        scores = hands @ RANK_SCORES
+        calls = scores <= self.dt[idx, seats]
+
+        if calls.any():
+            self._end_rounds(idx[calls], seats[calls], scores[calls])
+        moving = ~calls
+        if moving.any():
+            self._move(idx[moving], seats[moving], hands[moving])
+
+    def _move(self, idx, seats, hands):
+        # MinimizeCardNumberStrategy.make_a_move / DiscardBiggestStrategy.make_a_move for non-callers
+        rows = np.arange(len(idx))
+        top = self.graveyard[idx, self.graveyard_size[idx] - 1].astype(np.int64)
+        highest = NUM_RANKS - 1 - np.argmax(hands[:, ::-1] > 0, axis=1)
+
+        # Pool: the graveyard top pairs with the hand, so discard the highest other rank and take it
+        others = hands.copy()
+        others[rows, top] = 0
+        filtered_highest = NUM_RANKS - 1 - np.argmax(others[:, ::-1] > 0, axis=1)
+        pooling = (hands[rows, top] > 0) & (top >= self.pool[idx, seats]) & others.any(axis=1)
+
+        play_rank = np.where(pooling, filtered_highest, highest)
+        threshold = self.dg[idx, seats] - np.maximum(4, self.turn[idx] // 4)
+        from_graveyard = pooling | (top <= threshold)
+
+        # Player.play_cards
+        played = hands[rows, play_rank]
+        self.hands[idx, seats, play_rank] = 0
+
+        # Player.draw_card: take the top card of the chosen pile, then the played cards hit the graveyard
+        g = idx[from_graveyard]
+        self.graveyard_size[g] -= 1
+        self.hands[g, seats[from_graveyard], self.graveyard[g, self.graveyard_size[g]]] += 1
+        from_deck = ~from_graveyard & (self.deck_size[idx] > 0)
+        g = idx[from_deck]
+        self.deck_size[g] -= 1
+        self.hands[g, seats[from_deck], self.deck[g, self.deck_size[g]]] += 1
+        for j in range(int(played.max(initial=0))):
+            pushing = played > j
+            g = idx[pushing]
+            self.graveyard[g, self.graveyard_size[g] + j] = play_rank[pushing]
+        self.graveyard_size[idx] += played
+
+        # Game.check_refill_deck: everything under the graveyard top becomes the deck, in order
+        empty = idx[self.deck_size[idx] == 0]
+        if len(empty):
+            self.deck[empty] = self.graveyard[empty]
+            self.deck_size[empty] = self.graveyard_size[empty] - 1
+            self.graveyard[empty, 0] = self.graveyard[empty, self.graveyard_size[empty] - 1]
+            self.graveyard_size[empty] = 1
+            if self.reshuffle_refills:
+                self._shuffle_refills(empty)
+
+        # Game.play_round bookkeeping: a turn is one pass around the table
+        self.moves_in_turn[idx] += 1
+        passed = idx[self.moves_in_turn[idx] == self.alive[idx].sum(axis=1)]
+        self.moves_in_turn[passed] = 0
+        self.turn[passed] += 1
+        self.active[passed[self.turn[passed] > TURN_LIMIT]] = False
+        self.mover[idx] = self._next_alive(idx, seats)
+
+    def _end_rounds(self, idx, callers, caller_scores):
+        # Scoreboard.record_round for games whose mover called Dhumbal
+        self.turn[idx] += 1
+        scores = self.hands[idx].astype(np.int16) @ RANK_SCORES
+        alive = self.alive[idx]
+        is_caller = np.arange(self.num_seats) == callers[:, None]
+        lowest = np.where(alive & ~is_caller, scores, np.iinfo(np.int16).max).min(axis=1)
+        caller_won = caller_scores < lowest
+
+        destroyed = scores <= caller_scores[:, None]
+        points = np.where(destroyed, 0, scores)
+        results = np.where(destroyed, Result.DESTROYED.value, Result.NORMAL.value)
+        points = np.where(is_caller, np.where(caller_won, 0, DHUMBAL_PENALTY)[:, None], points)
+        results = np.where(is_caller, np.where(caller_won, Result.DHUMBAL.value, Result.GOT_DESTROYED.value)[:, None], results)
+        points = np.where(alive, points, 0).astype(np.int16)
+        self.cumulative[idx] += points
+        self.round_records.append((idx, self.round[idx], alive, points, self.cumulative[idx], results.astype(np.int8)))
+        self.round[idx] += 1
+
+        # Game.remove_eliminated_players / check_game_end
+        self.alive[idx] = alive & (self.cumulative[idx] < self.elimination_score)
+        over = (self.alive[idx].sum(axis=1) <= 1) | (self.turn[idx] > TURN_LIMIT)
+        self.active[idx[over]] = False
+
+        # Game.prepare_next_round: the worst scorer of the round goes last in the next one
+        going_on = ~over
+        if going_on.any():
+            worst = np.argmax(np.where(self.alive[idx[going_on]], points[going_on], -1), axis=1)
+            self._start_rounds(idx[going_on], worst)
+
+    def columns(self):
+        # Flat per-player-per-round columns (the ResultStore layout) in game, round, seating order.
+        # `player` indexes self.players and `game` indexes this batch.
+        if not self.round_records:
+            return {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS}
+        games, rounds, alive, points, cumulative, codes = (np.concatenate(column) for column in zip(*self.round_records))
+        order = np.lexsort((rounds, games))
+        record, seat = np.nonzero(alive[order])
+        record = order[record]
+        return {
+            'game': games[record],
+            'round': rounds[record],
+            'player': self.seat_player[games[record], seat],
+            'points': points[record, seat],
+            'cumulative': cumulative[record, seat],
+            'result': codes[record, seat],
+        }
+
+    def round_logs(self, columns=None):
+        # Scoreboard.round_log for every game: a list of {player: (points, cumulative, Result)} per round,
+        # with players in seating order. columns: self.columns(), if the caller already has them
+        results = [[] for _ in range(self.num_games)]
+        outcomes = list(Result)
+        columns = self.columns() if columns is None else columns
+        rows = zip(*(columns[name].tolist() for name, _ in COLUMNS))
+        for game, round_number, player, points, cumulative, code in rows:
+            round_logs = results[game]
+            if round_number == len(round_logs):
+                round_logs.append({})
+            round_logs[-1][self.players[player]] = (points, cumulative, outcomes[code])
+        return results
@@ -0,0 +1,264 @@
+import math
+import numpy as np
+
+from trueskill import TrueSkill, calc_draw_margin, DELTA
+
+from analysis import final_positions
+
+SQRT2 = math.sqrt(2)
+
+
+def erfc(x):
+    # Vectorized trueskill.backends.erfc; the same approximation keeps results in step with the package
+    z = np.abs(x)
+    t = 1. / (1. + z / 2.)
+    r = t * np.exp(-z * z - 1.26551223 + t * (1.00002368 + t * (
+        0.37409196 + t * (0.09678418 + t * (-0.18628806 + t * (
+            0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+                -0.82215223 + t * 0.17087277
+            )))
+        )))
+    )))
+    return np.where(x < 0, 2. - r, r)
+
+
+def cdf(x):
+    return 0.5 * erfc(-x / SQRT2)
+
+
+def pdf(x):
+    return 1 / math.sqrt(2 * math.pi) * np.exp(-(x ** 2 / 2))
+
+
+def truncate_win(diff, draw_margin):
+    # trueskill's v_win and w_win, sharing the cdf/pdf evaluations
+    x = diff - draw_margin
+    denom = cdf(x)
+    v = np.where(denom != 0, pdf(x) / denom, -x)
+    return v, v * (v + x)
+
+
+def truncate_draw(diff, draw_margin):
+    # trueskill's v_draw and w_draw, sharing the cdf/pdf evaluations
+    abs_diff = np.abs(diff)
+    a, b = draw_margin - abs_diff, -draw_margin - abs_diff
+    denom = cdf(a) - cdf(b)
+    pdf_a, pdf_b = pdf(a), pdf(b)
+    v = np.where(denom != 0, (pdf_b - pdf_a) / denom, a)
+    w = v ** 2 + (a * pdf_a - b * pdf_b) / denom
+    return v * np.where(diff < 0, -1, 1), w
+
+
+def gaussian_mu(pi, tau):
+    # trueskill's Gaussian.mu: `pi and tau / pi`
+    return np.where(pi != 0, tau / np.where(pi != 0, pi, 1), 0.)
+
+
+def sum_message(terms):
+    # SumFactor.update: message for sum(coeff * term) from (coeff, cavity pi, cavity tau) terms
+    mu, pi_inv = 0., 0.
+    for coeff, pi, tau in terms:
+        mu = mu + coeff * gaussian_mu(pi, tau)
+        pi_inv = pi_inv + coeff ** 2 / pi
+    pi = 1. / pi_inv
+    return pi, pi * mu
+
+
+class BatchTrueSkill:
+    # Free-for-all TrueSkill (one player per team) on NumPy arrays. Each call to rate() performs one
+    # rating update in each of many independent rating sequences at once, running the same factor graph
+    # message schedule as trueskill.TrueSkill.rate, so results agree with the package to rounding.
+    def __init__(self, mu=25., sigma=25. / 3, beta=25. / 6, tau=25. / 300, draw_probability=.10, min_delta=DELTA):
+        self.mu = mu
+        self.sigma = sigma
+        self.beta = beta
+        self.tau = tau
+        self.min_delta = min_delta
+        env = TrueSkill(mu=mu, sigma=sigma, beta=beta, tau=tau, draw_probability=draw_probability)
+        self.draw_margin = calc_draw_margin(draw_probability, 2, env)
+
+    def rate(self, mu, sigma, ranks, valid):
+        # One update per row: (batch, slots) arrays of the players' ratings and ranks (lower is better);
+        # slots where `valid` is False take no part. Ties in rank are draws and keep slot order,
+        # as the package's stable sort does.
+        rows = np.arange(mu.shape[0])[:, None]
+        order = np.argsort(np.where(valid, ranks, np.inf), axis=1, kind='stable')
+        size = valid.sum(axis=1)
+        new_mu, new_sigma = self._rate_sorted(mu[rows, order], sigma[rows, order], ranks[rows, order], size)
+        out_mu, out_sigma = np.array(mu, dtype=float), np.array(sigma, dtype=float)
+        out_mu[rows, order] = new_mu
+        out_sigma[rows, order] = new_sigma
+        return out_mu, out_sigma
+
+    def _rate_sorted(self, mu, sigma, ranks, size):
+        batch, slots = mu.shape
+        rated = size >= 2
+        if slots < 2 or not rated.any():
+            return np.array(mu, dtype=float), np.array(sigma, dtype=float)
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            # Rating, performance and team performance layers, sent down once
+            prior_sigma = np.sqrt(sigma ** 2 + self.tau ** 2)
+            s_pi = prior_sigma ** -2.
+            s_tau = s_pi * mu
+            a = 1. / (1. + self.beta ** 2 * s_pi)
+            p_pi, p_tau = a * s_pi, a * s_tau
+            tp_pi, tp_tau = sum_message([(1., p_pi, p_tau)])
+            t_pi, t_tau = tp_pi.copy(), tp_tau.copy()
+
+            # Team difference and truncation layers: marginals of the differences, the sum factors'
+            # messages to the left/right teams and to the difference, and the truncation messages
+            diffs = slots - 1
+            L_pi, L_tau, R_pi, R_tau = (np.zeros((batch, diffs)) for _ in range(4))
+            ds_pi, ds_tau, dt_pi, dt_tau = (np.zeros((batch, diffs)) for _ in range(4))
+            d_pi, d_tau = np.zeros((batch, diffs)), np.zeros((batch, diffs))
+            tie = ranks[:, :-1] == ranks[:, 1:]
+
+            def diff_down(j, mask):
+                pi, tau = sum_message([(1., t_pi[:, j] - L_pi[:, j], t_tau[:, j] - L_tau[:, j]),
+                                       (-1., t_pi[:, j + 1] - R_pi[:, j], t_tau[:, j + 1] - R_tau[:, j])])
+                d_pi[:, j] = np.where(mask, d_pi[:, j] - ds_pi[:, j] + pi, d_pi[:, j])
+                d_tau[:, j] = np.where(mask, d_tau[:, j] - ds_tau[:, j] + tau, d_tau[:, j])
+                ds_pi[:, j] = np.where(mask, pi, ds_pi[:, j])
+                ds_tau[:, j] = np.where(mask, tau, ds_tau[:, j])
+
+            def diff_up(j, index, mask):
+                # index 0 updates the left team (t_j = d_j + t_j+1), index 1 the right one (t_j+1 = t_j - d_j)
+                d_cavity = (d_pi[:, j] - ds_pi[:, j], d_tau[:, j] - ds_tau[:, j])
+                if index == 0:
+                    pi, tau = sum_message([(1., *d_cavity), (1., t_pi[:, j + 1] - R_pi[:, j], t_tau[:, j + 1] - R_tau[:, j])])
+                    team, msg_pi, msg_tau = j, L_pi, L_tau
+                else:
+                    pi, tau = sum_message([(1., t_pi[:, j] - L_pi[:, j], t_tau[:, j] - L_tau[:, j]), (-1., *d_cavity)])
+                    team, msg_pi, msg_tau = j + 1, R_pi, R_tau
+                t_pi[:, team] = np.where(mask, t_pi[:, team] - msg_pi[:, j] + pi, t_pi[:, team])
+                t_tau[:, team] = np.where(mask, t_tau[:, team] - msg_tau[:, j] + tau, t_tau[:, team])
+                msg_pi[:, j] = np.where(mask, pi, msg_pi[:, j])
+                msg_tau[:, j] = np.where(mask, tau, msg_tau[:, j])
+
+            def trunc_up(j, mask):
+                div_pi, div_tau = d_pi[:, j] - dt_pi[:, j], d_tau[:, j] - dt_tau[:, j]
+                sqrt_pi = np.sqrt(div_pi)
+                diff, margin = div_tau / sqrt_pi, self.draw_margin * sqrt_pi
+                draw = tie[:, j]
+                v, w = truncate_win(diff, margin)
+                if np.any(mask & draw):
+                    v_tie, w_tie = truncate_draw(diff, margin)
+                    v, w = np.where(draw, v_tie, v), np.where(draw, w_tie, w)
+                if np.any(mask & ~(np.isfinite(w) & (draw | ((0 < w) & (w < 1))))):
+                    raise FloatingPointError('Cannot calculate correctly, set backend to "mpmath"')
+                denom = 1. - w
+                pi, tau = div_pi / denom, (div_tau + sqrt_pi * v) / denom
+                pi_delta = np.abs(d_pi[:, j] - pi)
+                delta = np.maximum(np.abs(d_tau[:, j] - tau), np.where(np.isinf(pi_delta), 0., np.sqrt(pi_delta)))
+                dt_pi[:, j] = np.where(mask, pi + dt_pi[:, j] - d_pi[:, j], dt_pi[:, j])
+                dt_tau[:, j] = np.where(mask, tau + dt_tau[:, j] - d_tau[:, j], dt_tau[:, j])
+                d_pi[:, j] = np.where(mask, pi, d_pi[:, j])
+                d_tau[:, j] = np.where(mask, tau, d_tau[:, j])
+                return np.where(mask, delta, 0.)
+
+            # TrueSkill.run_schedule, with every row stopping on its own convergence
+            two_teams, multi_teams = rated & (size == 2), rated & (size > 2)
+            converged = ~rated
+            for _ in range(10):
+                running = ~converged
+                mask = running & two_teams
+                diff_down(0, mask)
+                delta = trunc_up(0, mask)
+                for x in range(diffs - 1):
+                    mask = running & multi_teams & (x < size - 2)
+                    diff_down(x, mask)
+                    delta = np.maximum(delta, trunc_up(x, mask))
+                    diff_up(x, 1, mask)
+                for x in range(diffs - 1, 0, -1):
+                    mask = running & multi_teams & (x <= size - 2)
+                    diff_down(x, mask)
+                    delta = np.maximum(delta, trunc_up(x, mask))
+                    diff_up(x, 0, mask)
+                converged |= running & (delta <= self.min_delta)
+                if converged.all():
+                    break
+            diff_up(0, 0, rated)
+            for j in range(diffs):
+                diff_up(j, 1, rated & (j == size - 2))
+
+            # Back up through the team performance, performance and rating layers
+            m_pi, m_tau = sum_message([(1., t_pi - tp_pi, t_tau - tp_tau)])
+            msg_pi, msg_tau = (p_pi + m_pi) - p_pi, (p_tau + m_tau) - p_tau
+            a = 1. / (1. + self.beta ** 2 * msg_pi)
+            new_pi, new_tau = s_pi + a * msg_pi, s_tau + a * msg_tau
+            updated = rated[:, None] & (np.arange(slots) < size[:, None])
+            new_mu = np.where(updated, gaussian_mu(new_pi, new_tau), mu)
+            new_sigma = np.where(updated, np.sqrt(1. / new_pi), sigma)
+        return new_mu, new_sigma
+
+    def replay(self, players, ranks, num_players):
+        # Run many rating sequences side by side. players and ranks are (sequences, steps, slots) arrays
+        # giving, for every step, the participating player indices (-1 for an empty slot) and their ranks.
+        # Returns the preallocated (sequences, steps, num_players, 2) array of (mu, sigma) after each step;
+        # players who sit a step out keep their rating.
+        sequences, steps, _ = players.shape
+        progression = np.empty((sequences, steps, num_players, 2))
+        mu = np.full((sequences, num_players), float(self.mu))
+        sigma = np.full((sequences, num_players), float(self.sigma))
+        rows = np.arange(sequences)[:, None]
+        for step in range(steps):
+            step_players = players[:, step]
+            valid = step_players >= 0
+            slot_players = np.where(valid, step_players, 0)
+            new_mu, new_sigma = self.rate(mu[rows, slot_players], sigma[rows, slot_players], ranks[:, step], valid)
+            sequence, slot = np.nonzero(valid)
+            mu[sequence, step_players[sequence, slot]] = new_mu[sequence, slot]
+            sigma[sequence, step_players[sequence, slot]] = new_sigma[sequence, slot]
+            progression[:, step, :, 0] = mu
+            progression[:, step, :, 1] = sigma
+        return progression
+
+
+def progression_lists(progression, players, player_names):
+    # TrueskillDhumbal.ranking_progression dicts ({name: [(mu, sigma), ...]}) for every sequence of a
+    # replay, keeping only the steps each player took part in
+    windows = []
+    for sequence in range(progression.shape[0]):
+        taking_part = (players[sequence][:, :, None] == np.arange(len(player_names))).any(axis=1)
+        windows.append({name: [tuple(rating) for rating in progression[sequence, taking_part[:, index], index].tolist()]
+                        for index, name in enumerate(player_names)})
+    return windows
+
+
+def round_outcome_steps(columns, window, batches):
+    # replay() inputs for TrueskillDhumbal.ratings_round_outcome over `batches` windows of `window` games:
+    # one step per round, players in seating order, ranked by the points they scored
+    game = np.asarray(columns['game'], dtype=np.int64)
+    rows = np.flatnonzero(game < window * batches)
+    game, round_number = game[rows], np.asarray(columns['round'], dtype=np.int64)[rows]
+    player, points = np.asarray(columns['player'])[rows], np.asarray(columns['points'])[rows]
+
+    new_round = np.r_[True, (game[1:] != game[:-1]) | (round_number[1:] != round_number[:-1])] if len(rows) else np.zeros(0, dtype=bool)
+    round_id = np.cumsum(new_round) - 1
+    round_start = np.flatnonzero(new_round)
+    batch = game // window
+    first_round = round_id[np.searchsorted(game, batch * window)]
+    step = round_id - first_round
+    slot = np.arange(len(rows)) - round_start[round_id]
+    return _fill_steps(batches, batch, step, slot, player, points)
+
+
+def game_outcome_steps(columns, num_players, window, batches):
+    # replay() inputs for TrueskillDhumbal.ratings_game_outcome: one step per game, ranked by final position.
+    # Games are counted like the player_stats position lists, which skip games without a recorded round.
+    pair_game, pair_player, positions = final_positions(columns, num_players)
+    _, ordinal = np.unique(pair_game, return_inverse=True)
+    keep = ordinal < window * batches
+    ordinal, player, positions = ordinal[keep], pair_player[keep], positions[keep]
+    return _fill_steps(batches, ordinal // window, ordinal % window, player, player, positions)
+
+
+def _fill_steps(batches, batch, step, slot, player, rank):
+    steps = int(step.max()) + 1 if len(step) else 0
+    slots = int(slot.max()) + 1 if len(slot) else 0
+    players = np.full((batches, steps, slots), -1, dtype=np.int64)
+    ranks = np.zeros((batches, steps, slots))
+    players[batch, step, slot] = player
+    ranks[batch, step, slot] = rank
+    return players, ranks
@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+from game import Game, game_rng, min_decks
+from montecarlo import MonteCarlo
+from player import Player, CardCountingStrategy, DiscardBiggestStrategy, MinimizeCardNumberStrategy
+from profiling import GameProfiler
+from trueskill_dhumbal import TrueskillDhumbal
+
+# Throughput and latency benchmarks for the simulation engine. run_benchmarks returns
+# {benchmark: {metric: value}}; compare() checks such a result against stored baselines
+# (benchmarks/baselines.json by default). Metrics ending in _per_second are better when higher,
+# all others (seconds, bytes) when lower, except the DESCRIPTIVE_METRICS, which describe how games
+# play out rather than how fast and are not compared.
+BASELINES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'baselines.json')
+
+STRATEGY_MIXES = {
+    'discard': lambda i: DiscardBiggestStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5),
+    'minimize': lambda i: MinimizeCardNumberStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5, try_to_pool_threshold=2),
+    'mixed': lambda i: STRATEGY_MIXES['discard' if i % 2 == 0 else 'minimize'](i),
+    'counting': lambda i: CardCountingStrategy(dhumbal_threshold=7, call_margin=2, draw_margin=1),
+}
+DESCRIPTIVE_METRICS = ('decks', 'rounds_per_game', 'turns_per_round', 'refills_per_round')
+
+
+def make_table(num_players, mix='mixed'):
+    return [Player(f'Player {i + 1}', STRATEGY_MIXES[mix](i)) for i in range(num_players)]
+
+
+def _timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def bench_games(player_counts=range(2, 9), mixes=tuple(STRATEGY_MIXES), num_games=200, seed=0):
+    # Game.start_game throughput for every table size and strategy mix
+    results = {}
+    for mix in mixes:
+        for num_players in player_counts:
+            game = Game(make_table(num_players, mix))
+            start = time.perf_counter()
+            for i in range(num_games):
+                game.reset(game_rng(seed, i))
+                game.start_game()
+            seconds = time.perf_counter() - start
+            results[f'games/{mix}/{num_players}p'] = {'games_per_second': num_games / seconds}
+    return results
+
+
+def bench_scaling(player_counts=range(2, 13), hand_size=5, jokers=2, num_games=200, profiled_games=50, seed=0, mix='mixed'):
+    # How the game scales with the table: Game throughput at every table size, each played with the
+    # fewest decks that deal it (min_decks), and the shape of its rounds from a separate profiled run,
+    # since the profiler's wrappers would skew the timing
+    results = {}
+    for num_players in player_counts:
+        decks = min_decks(num_players, hand_size, jokers)
+        options = {'hand_size': hand_size, 'decks': decks, 'jokers': jokers}
+        game = Game(make_table(num_players, mix), **options)
+        start = time.perf_counter()
+        for i in range(num_games):
+            game.reset(game_rng(seed, i))
+            game.start_game()
+        seconds = time.perf_counter() - start
+
+        profiler = GameProfiler()
+        players = make_table(num_players, mix)
+        rounds = 0
+        for i in range(profiled_games):
+            game = Game(players, rng=game_rng(seed, i), profiler=profiler, **options)
+            game.start_game()
+            rounds += len(game.scoreboard.round_log)
+        turns = sum(turns * count for turns, count in profiler.turns_per_round.items())
+        results[f'scaling/{num_players}p'] = {'games_per_second': num_games / seconds, 'decks': decks,
+                                              'rounds_per_game': rounds / profiled_games,
+                                              'turns_per_round': turns / rounds, 'refills_per_round': profiler.refills / rounds}
+    return results
+
+
+def bench_analysis(sizes=(10 ** 3, 10 ** 4, 10 ** 5), loop_max=10 ** 5, num_players=4, seed=0):
+    # MonteCarlo.analyze_results latency. The games are played by the vectorized engine; in-memory
+    # results are analyzed by the loop and the NumPy path (the loop only up to loop_max games), and a
+    # ResultStore by the NumPy path.
+    results = {}
+    players = make_table(num_players)
+    for size in sizes:
+        if size <= loop_max:
+            for vectorized in (False, True):
+                mc = MonteCarlo(players, size)
+                mc.run_batch_simulation(seed=seed)
+                results[f'analysis/{"numpy" if vectorized else "loop"}/{size}'] = {
+                    'seconds': _timed(lambda: mc.analyze_results(vectorized=vectorized))}
+        with tempfile.TemporaryDirectory() as directory:
+            mc = MonteCarlo(players, size, store=directory)
+            mc.run_batch_simulation(seed=seed)
+            results[f'analysis/store/{size}'] = {'seconds': _timed(mc.analyze_results)}
+    return results
+
+
+def bench_trueskill(num_games=2000, num_players=4, seed=0, window=10):
+    # TrueskillDhumbal.ratings_round_outcome, one rating update per round, and run_batched_simulation
+    # over num_games // window windows: hundreds of them, the sizes the batched engine is meant for
+    players = make_table(num_players)
+    mc = MonteCarlo(players, num_games)
+    mc.run_batch_simulation(seed=seed)
+    mc.analyze_results(vectorized=True)
+    updates = sum(len(round_logs) for round_logs in mc.results)
+    ts = TrueskillDhumbal(mc, players)
+    seconds = _timed(lambda: ts.ratings_round_outcome(num_games))
+    batched = TrueskillDhumbal(mc, players)
+    batched_seconds = _timed(lambda: batched.run_batched_simulation(window=window, batches=num_games // window, outcome='round'))
+    return {'trueskill/round_outcome': {'updates_per_second': updates / seconds},
+            'trueskill/batched_round_outcome': {'updates_per_second': updates / batched_seconds}}
+
+
+def bench_memory(num_games=10000, num_players=4, seed=0):
+    # Peak traced allocation of a 10k-game run_simulation that keeps its round logs, and of a streamed
+    # one; reported per 10k games
+    results = {}
+    for stream in (False, True):
+        mc = MonteCarlo(make_table(num_players), num_games, stream=stream)
+        tracemalloc.start()
+        try:
+            mc.run_simulation(seed=seed)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        results[f'memory/{"stream" if stream else "results"}'] = {'peak_bytes_per_10k_games': peak * 10000 / num_games}
+    return results
+
+
+def run_benchmarks(quick=False, analysis_sizes=None):
+    # quick=True shrinks every benchmark to a smoke test of a few seconds
+    if quick:
+        return {**bench_games(player_counts=(2, 4), num_games=20), **bench_scaling(player_counts=(2, 12), num_games=10, profiled_games=5),
+                **bench_analysis(sizes=(1000,)),
+                **bench_trueskill(num_games=200), **bench_memory(num_games=100)}
+    return {**bench_games(), **bench_scaling(), **bench_analysis(**({'sizes': analysis_sizes} if analysis_sizes else {})),
+            **bench_trueskill(), **bench_memory()}
+
+
+def compare(results, baselines, tolerance=0.1):
+    # {benchmark: {metric: {'value', 'baseline', 'ratio', 'regression'}}} for the metrics in both.
+    # ratio > 1 is an improvement; a regression is a ratio below 1 - tolerance.
+    report = {}
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            baseline = baselines.get(name, {}).get(metric)
+            if baseline is None or metric in DESCRIPTIVE_METRICS:
+                continue
+            ratio = value / baseline if metric.endswith('_per_second') else baseline / value
+            report.setdefault(name, {})[metric] = {'value': value, 'baseline': baseline, 'ratio': ratio,
+                                                   'regression': ratio < 1 - tolerance}
+    return report
+
+
+def load_baselines(path=BASELINES):
+    with open(path) as f:
+        return json.load(f)['benchmarks']
+
+
+def save_baselines(results, path=BASELINES):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'machine': {'python': platform.python_version(), 'processor': platform.processor() or platform.machine(),
+                               'cpus': os.cpu_count()},
+                   'benchmarks': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the simulation engine and compare with the stored baselines')
+    parser.add_argument('--quick', action='store_true', help='small smoke-test sizes')
+    parser.add_argument('--full', action='store_true', help='analysis latency up to 10^6 games')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baselines')
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = run_benchmarks(quick=args.quick, analysis_sizes=(10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6) if args.full else None)
+    if args.save:
+        save_baselines(results, args.baselines)
+    elif os.path.exists(args.baselines):
+        for name, metrics in compare(results, load_baselines(args.baselines), args.tolerance).items():
+            for metric, entry in metrics.items():
+                flag = '  REGRESSION' if entry['regression'] else ''
+                print(f"{name:40} {metric:26} {entry['value']:14.4g} baseline {entry['baseline']:12.4g} x{entry['ratio']:.2f}{flag}")
+    else:
+        print(json.dumps(results, indent=2))
@@ -29,33 +29,83 @@ class Value(Enum):
     TWELVE = 12
     JOKER = 0
 
+NUM_RANKS = len(Value)  # rank values run from 0 (joker) to 12
+
+# Packed card encoding: the suit's position in Suit goes in the high bits and the rank value in
+# the low 4 bits. Hot paths look rank, suit and score up in the tables below instead of going
+# through the Enum members.
+RANK_BITS = 4
+SUITS = list(Suit)
+NUM_CARD_CODES = len(SUITS) << RANK_BITS
+
+CARD_RANK = tuple(code & ((1 << RANK_BITS) - 1) for code in range(NUM_CARD_CODES))  # rank value of each code
+CARD_SUIT = tuple(SUITS[code >> RANK_BITS] for code in range(NUM_CARD_CODES))
+CARD_SCORE = tuple(min(rank, 10) for rank in CARD_RANK)  # points the card counts for in a hand
+RANK_SCORE = tuple(min(rank, 10) for rank in range(NUM_RANKS))  # the same, by rank value
+
+
+def encode_card(rank: Value, suit: Suit):
+    return SUITS.index(suit) << RANK_BITS | rank.value
+
 
 class Card:
     def __init__(self, rank: Value, suit: Suit):
         self.rank = rank
         self.suit = suit
+        self.code = encode_card(rank, suit)
     def __str__(self):
         return f'{self.rank.name}{self.suit.value}'
 
+
+def generate_card_pool():
+    pool = []
+    for suit in Suit:
+        for rank in Value:
+            if rank != Value.JOKER and suit != Suit.NONE:
+                pool.append(Card(rank, suit))
+    for _ in range(2):
+        pool.append(Card(Value.JOKER, Suit.NONE))
+    return tuple(pool)
+
+# Cards never change once created, so every deck is built from this one set of Card objects
+CARD_POOL = generate_card_pool()
+POOL_RANK_COUNTS = tuple(sum(CARD_RANK[card.code] == rank for card in CARD_POOL) for rank in range(NUM_RANKS))
+
+
+def card_pool(decks=1, jokers=2):
+    # The cards of `decks` standard decks shuffled together with `jokers` jokers. Copies of a card are
+    # the same Card object, which is fine since cards are only ever compared by code.
+    if decks == 1 and jokers == 2:
+        return CARD_POOL
+    if decks < 1 or jokers < 0:
+        raise ValueError(f"Cannot build a pool of {decks} decks and {jokers} jokers")
+    ranked = CARD_POOL[:-2] * decks
+    return ranked + (CARD_POOL[-1],) * jokers
+
+
 class Deck:
-    def __init__(self):
+    def __init__(self, rng=None, shuffle=True, decks=1, jokers=2):
+        # rng: a random.Random to shuffle with; the global random module by default
+        self.rng = random if rng is None else rng
+        self.pool = card_pool(decks, jokers)
+        self.rank_counts = tuple(sum(CARD_RANK[card.code] == rank for card in self.pool) for rank in range(NUM_RANKS))
+        self.total_cards = len(self.pool)
+        self.total_score = sum(CARD_SCORE[card.code] for card in self.pool)
         self.cards = self.generate_deck()
-        self.shuffle_deck()
+        if shuffle:
+            self.shuffle_deck()
 
     def generate_deck(self):
-        deck = []
-        for suit in Suit:
-            for rank in Value:
-                if rank != Value.JOKER and suit != Suit.NONE:
-                    card = Card(rank, suit)
-                    deck.append(card)
-        for _ in range(2):
-            card = Card(Value.JOKER, Suit.NONE)
-            deck.append(card)
-        return deck
+        return list(self.pool)
+
+    def reset(self, shuffle=True):
+        # Refill the existing card list with the full pool and reshuffle it in place
+        self.cards[:] = self.pool
+        if shuffle:
+            self.shuffle_deck()
     
     def shuffle_deck(self):
-        random.shuffle(self.cards)
+        self.rng.shuffle(self.cards)
         
 if __name__ == '__main__':
     deck = Deck()
@@ -1,23 +1,96 @@
-from cards import Deck
+from cards import CARD_RANK, CARD_SCORE, NUM_RANKS, Deck, card_pool
+from observation import Observation
 from scoreboard import Scoreboard
+from tracing import NULL_SINK, PrintSink
 import random
+import numpy as np
+
+
+def game_rng(seed, index):
+    # RNG of game `index` in a run with master seed `seed`: child `index` of SeedSequence(seed).spawn
+    state = np.random.SeedSequence(seed, spawn_key=(index,)).generate_state(4)
+    return random.Random(state.tobytes())
+
+
+# Game keyword arguments that change how the game is played, with their defaults, as MonteCarlo
+# threads them through its engines and game_trace stores them in a trace header
+GAME_OPTIONS = {'reshuffle_refills': False, 'hand_size': 5, 'decks': 1, 'jokers': 2, 'elimination_score': 108}
+
+
+def min_decks(num_players, hand_size=5, jokers=2):
+    # Fewest decks that deal every player `hand_size` cards and leave at least two to draw from
+    decks = 1
+    while len(card_pool(decks, jokers)) < num_players * hand_size + 2:
+        decks += 1
+    return decks
+
 
 class Game:
-    def __init__(self, players, verbose=False):
-        self.players = players
-        random.shuffle(self.players)
+    def __init__(self, players, verbose=False, rng=None, profiler=None, tracer=None, reshuffle_refills=False,
+                 hand_size=5, decks=1, jokers=2, elimination_score=108):
+        # rng: a random.Random for the seating, the starting player and every shuffle of this game;
+        # the global random module by default. The caller's player list is left in its order.
+        self.rng = random if rng is None else rng
+        # reshuffle_refills: shuffle the cards recycled from the graveyard when the deck runs out, as
+        # at a real table; by default they become the deck in the order they were played
+        self.reshuffle_refills = reshuffle_refills
+        # Table rules: cards dealt to each player, standard decks and jokers shuffled together, and the
+        # cumulative score that eliminates a player. Larger tables need more decks (see min_decks).
+        self.hand_size = hand_size
+        self.table = list(players)
         self.verbose = verbose
-        self.deck = Deck()
+        # tracer: event sink (see tracing.py); verbose=True prints the events
+        self.tracer = tracer if tracer is not None else (PrintSink() if verbose else NULL_SINK)
+        # The deck, graveyard, scoreboard and observations are kept for the next game by reset()
+        self.deck = Deck(self.rng, shuffle=False, decks=decks, jokers=jokers)  # start_game shuffles it
+        if len(self.table) * hand_size + 2 > self.deck.total_cards:
+            raise ValueError(f"{self.deck.total_cards} cards cannot deal {hand_size} to each of {len(self.table)} players"
+                             f" and leave two to draw; use more decks")
         self.graveyard = []
-        self.current_player = random.choice(players)
+        self.scoreboard = Scoreboard(self.table, elimination_score)
+        # Each player's Observation of the game, passed to its strategy
+        self.observations = {player: Observation(player, self) for player in self.table}
+        self.reset()
+        # profiler: an optional profiling.GameProfiler that times and counts this game's phases
+        if profiler is not None:
+            profiler.attach(self)
+
+    def reset(self, rng=None):
+        # Set up a new game with the same players in place; with the same rng it plays exactly like a
+        # new Game(players, rng=rng). MonteCarlo plays a whole run on one Game this way.
+        if rng is not None:
+            self.rng = self.deck.rng = rng
+        self.players = list(self.table)
+        self.rng.shuffle(self.players)
+        # Whether to keep the card counts below; only strategies that read them pay for them
+        self.counts_cards = any(player.strategy.counts_cards for player in self.table)
+        # Players are reused between games, so drop anything left over from the previous one
+        for player in self.players:
+            player.reset_hand()
+            player.called_dhumbal = False
+        self.deck.reset(shuffle=False)
+        self.graveyard.clear()
+        self.current_player = self.rng.choice(self.players)
         self.turn = 0
         self.round = 0
         self.round_over = False
         self.game_over = False
-        self.scoreboard = Scoreboard(self.players)
+        self.scoreboard.reset(self.players)
+        # Per rank value, this round: cards that have been face up on the graveyard, cards on the
+        # graveyard now, and cards players were seen taking from the graveyard and still hold (each
+        # player's share is in Player.known_ranks), plus the score totals of the last two. Kept up to
+        # date card by card in Player.draw_card while counts_cards is set.
+        self.seen_ranks = [0] * NUM_RANKS
+        self.graveyard_ranks = [0] * NUM_RANKS
+        self.graveyard_score = 0
+        self.known_ranks = [0] * NUM_RANKS
+        self.known_cards = 0
+        self.known_score = 0
 
     def start_game(self):
         self.deck.shuffle_deck()
+        if self.tracer.enabled:
+            self.tracer.emit('game_start', players=[player.name for player in self.players], starting_player=self.current_player.name)
         while not self.game_over:
             self.deal_cards()
             self.play_round()
@@ -25,21 +98,41 @@ class Game:
             self.remove_eliminated_players()
             if self.check_game_end():
                 self.game_over = True
-            else:
+            elif not self.game_over:
+                # After the turn limit there is no next round, and turn stays past 100 to show it
                 self.prepare_next_round()
-        print("Game Over", self.scoreboard.get_scores()) if self.verbose else None
+        if self.tracer.enabled:
+            self.tracer.emit('game_end', scores={player.name: score for player, score in self.scoreboard.get_scores().items()})
 
     def deal_cards(self):
-        for _ in range(5):
+        for _ in range(self.hand_size):
             for player in self.players:
                 player.draw_card(self.deck.cards, self)
         self.graveyard.append(self.deck.cards.pop())
+        if self.counts_cards:
+            top_rank = CARD_RANK[self.graveyard[-1].code]
+            self.seen_ranks[top_rank] += 1
+            self.graveyard_ranks[top_rank] += 1
+            self.graveyard_score = CARD_SCORE[self.graveyard[-1].code]
+        if self.tracer.enabled:
+            self.tracer.emit('deal', round=self.round, hands={player.name: [str(card) for card in player.hand] for player in self.players},
+                             graveyard=str(self.graveyard[-1]))
     
     def check_refill_deck(self):
         if not self.deck.cards:
-            self.deck.cards = self.graveyard[:-1]
-            self.graveyard = self.graveyard[-1:]
-            print("Deck refilled") if self.verbose else None
+            # Everything under the graveyard top becomes the deck: swap the two lists rather than
+            # copying, and put the top card back on the (now empty) graveyard
+            top = self.graveyard.pop()
+            self.deck.cards, self.graveyard = self.graveyard, self.deck.cards
+            self.graveyard.append(top)
+            if self.reshuffle_refills:
+                self.shuffle_refill()
+            if self.counts_cards:
+                self.graveyard_ranks = [0] * NUM_RANKS
+                self.graveyard_ranks[CARD_RANK[self.graveyard[0].code]] = 1
+                self.graveyard_score = CARD_SCORE[self.graveyard[0].code]
+            if self.tracer.enabled:
+                self.tracer.emit('refill', cards=len(self.deck.cards))
 
     def play_round(self):
         # Determine the starting index of the current player
@@ -59,39 +152,46 @@ class Game:
                 self.check_refill_deck()
 
             self.turn += 1
-            print("Turn", self.turn) if self.verbose else None
             if self.turn > 100:
-                print("Turn limit (100) reached. Code breaking") if self.verbose else None
+                if self.tracer.enabled:
+                    self.tracer.emit('turn_limit', turn=self.turn)
                 self.game_over = True
                 break
 
+    def shuffle_refill(self):
+        # Shuffle the cards recycled into the deck (reshuffle_refills); paired.PairedGame keys it apart
+        self.rng.shuffle(self.deck.cards)
+
     def record_scores(self):
         # Calculate and record scores at the end of the round
         self.scoreboard.record_round(self)
 
     def remove_eliminated_players(self):
-        # Remove players with 108 points or more
+        # Remove players who reached the elimination score
         eliminated_players = self.scoreboard.get_eliminated_players()
         self.players = [player for player in self.players if player not in eliminated_players]
 
     def check_game_end(self):
-        # Game ends if 1 or fewer players remain with less than 108 points
+        # Game ends if 1 or fewer players remain below the elimination score
         return len(self.players) <= 1
 
     def prepare_next_round(self):
         # Reset the deck and graveyard for the next round
-        self.deck = Deck()
-        self.deck.shuffle_deck()
+        self.deck.reset()
         self.graveyard.clear()
+        self.seen_ranks = [0] * NUM_RANKS
+        self.graveyard_ranks = [0] * NUM_RANKS
+        self.graveyard_score = 0
+        self.known_ranks = [0] * NUM_RANKS
+        self.known_cards = 0
+        self.known_score = 0
         self.turn = 0
         self.round += 1
         self.round_over = False
         self.current_player = self.scoreboard.get_last_player()
         for player in self.players:
-            player.hand.clear()
+            player.reset_hand()
             player.called_dhumbal = False
-        print("Starting Round", self.round) if self.verbose else None
-        print("Current Scores:", self.scoreboard.get_scores()) if self.verbose else None
         # input("Press Enter to continue...")
         
 
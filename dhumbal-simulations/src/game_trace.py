@@ -0,0 +1,241 @@
+import json
+import struct
+
+from cards import CARD_RANK, NUM_RANKS
+from game import GAME_OPTIONS, Game, game_rng
+from player import Player, PlayerStrategy
+
+# A trace file is MAGIC, a uint32 length and a JSON header ({'players': names in the order Game got
+# them, 'seed': MonteCarlo.seed, plus the game.GAME_OPTIONS the games were played with}), then one
+# record per game:
+#   GAME_HEADER  game index (uint64), flags (uint8), seats (uint8), starting seat (uint8), move bytes (uint32)
+#   seating      one byte per seat: index of the player in the header's names
+#   moves        the code of each make_a_move call, in the order they happened (see encode_move)
+# The deals come from game_rng(seed, index), so a game is rebuilt from its moves alone.
+MAGIC = b'DHTRACE1'
+GAME_HEADER = struct.Struct('<QBBBI')
+TURN_LIMIT = 1  # flag: the game ended on the 100-turn limit
+
+# Move codes: DHUMBAL, or played count (0-8 cards of one rank), rank and where the card was drawn from
+# in one byte. Larger plays, which only bigger hands of several decks allow, take three bytes: WIDE_PLAY,
+# the count, then rank and source.
+DHUMBAL = 0xFF
+WIDE_PLAY = 0xFE
+MAX_PLAYED = 8  # most cards a one-byte code can hold
+MAX_WIDE_PLAYED = 0xFF
+
+
+def encode_move(rank, count, from_graveyard):
+    # The bytes of a play of `count` cards of rank value `rank`
+    if count <= MAX_PLAYED:
+        return bytes(((count * NUM_RANKS + rank) * 2 + from_graveyard,))
+    if count > MAX_WIDE_PLAYED:
+        raise ValueError(f"Cannot record {count} cards played at once")
+    return bytes((WIDE_PLAY, count, rank * 2 + from_graveyard))
+
+
+def decode_move(code):
+    # (rank, count, from_graveyard) of a one-byte code, or None for a Dhumbal call
+    if code == DHUMBAL:
+        return None
+    code, from_graveyard = divmod(code, 2)
+    count, rank = divmod(code, NUM_RANKS)
+    return rank, count, bool(from_graveyard)
+
+
+def decode_moves(data):
+    # The decoded moves of a record's move bytes, in order
+    codes = iter(data)
+    for code in codes:
+        if code == WIDE_PLAY:
+            count = next(codes)
+            rank, from_graveyard = divmod(next(codes), 2)
+            yield rank, count, bool(from_graveyard)
+        else:
+            yield decode_move(code)
+
+
+class MoveRecorder:
+    # Records one game's moves by wrapping its players' make_a_move and draw_card, the way
+    # profiling.GameProfiler does. Create it before game.start_game(); encode() afterwards returns
+    # the game's record and removes the wrappers. Games without a recorder are untouched.
+    def __init__(self, game, index, player_names):
+        self.game = game
+        self.index = index
+        self.seating = bytes(player_names.index(player.name) for player in game.players)
+        self.starting_seat = game.players.index(game.current_player)
+        self.moves = bytearray()
+        self.players = list(game.players)
+        for player in self.players:
+            self._wrap(player)
+
+    def _wrap(self, player):
+        game = self.game
+        moves = self.moves
+        make_a_move = player.make_a_move
+        draw_card = type(player).draw_card.__get__(player)
+        pending = []
+
+        def recorded_draw_card(cards, game_):
+            # Only draws inside a move are recorded; the deal calls draw_card too
+            if pending:
+                played = player.cards_to_be_played
+                ranks = {CARD_RANK[card.code] for card in played}
+                if len(ranks) > 1:
+                    raise ValueError("Only plays of a single rank can be recorded")
+                pending[0] = encode_move(ranks.pop() if ranks else 0, len(played), cards is game.graveyard)
+            draw_card(cards, game_)
+
+        def recorded_make_a_move(game_):
+            pending.append(None)
+            try:
+                dhumbal = make_a_move(game_)
+                if dhumbal:
+                    moves.append(DHUMBAL)
+                elif pending[0] is None:
+                    raise ValueError(f"{player.name} neither drew a card nor called Dhumbal")
+                else:
+                    moves.extend(pending[0])
+                return dhumbal
+            finally:
+                pending.clear()
+
+        player.make_a_move = recorded_make_a_move
+        player.draw_card = recorded_draw_card
+
+    def encode(self):
+        for player in self.players:
+            player.__dict__.pop('make_a_move', None)
+            player.__dict__.pop('draw_card', None)
+        # Game only counts past 100 turns when the limit stopped it, whether or not the last pass
+        # ended with a Dhumbal call; it does not prepare a next round after that
+        flags = TURN_LIMIT if self.game.turn > 100 else 0
+        return (GAME_HEADER.pack(self.index, flags, len(self.seating), self.starting_seat, len(self.moves))
+                + self.seating + bytes(self.moves))
+
+
+class TraceWriter:
+    def __init__(self, path, player_names, seed, game_options=None):
+        # game_options: Game keyword arguments from GAME_OPTIONS, e.g. MonteCarlo.game_options
+        self.player_names = list(player_names)
+        self.seed = seed
+        self.file = open(path, 'wb')
+        header = json.dumps({'players': self.player_names, 'seed': str(seed), **(game_options or {})}).encode()
+        self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+    def append(self, record):
+        self.file.write(record)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GameTrace:
+    def __init__(self, index, flags, seating, starting_seat, moves):
+        self.index = index
+        self.turn_limit = bool(flags & TURN_LIMIT)
+        self.seating = seating  # player indices, in seat order
+        self.starting_seat = starting_seat
+        self.moves = moves  # bytes of move codes
+
+    def decoded_moves(self):
+        return decode_moves(self.moves)
+
+    def dhumbal_calls(self):
+        return sum(move is None for move in self.decoded_moves())
+
+
+class TraceReader:
+    # Reads a trace file. Opening it scans the game headers once to index the records; games() reads
+    # the records without replaying anything, replay() rebuilds a game's round log.
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a game trace")
+            length, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(length))
+            self.offsets = []
+            self.indices = {}
+            while True:
+                offset = f.tell()
+                data = f.read(GAME_HEADER.size)
+                if len(data) < GAME_HEADER.size:
+                    break
+                index, _, seats, _, moves = GAME_HEADER.unpack(data)
+                self.indices[index] = len(self.offsets)
+                self.offsets.append(offset)
+                f.seek(seats + moves, 1)
+        self.player_names = header['players']
+        self.seed = int(header['seed'])
+        # Options missing from the header (older traces) are the Game defaults
+        self.game_options = {option: header[option] for option in GAME_OPTIONS if option in header}
+        self.reshuffle_refills = self.game_options.get('reshuffle_refills', False)
+        self.num_games = len(self.offsets)
+
+    def games(self, start=0, stop=None):
+        # GameTrace records start..stop, in file order
+        with open(self.path, 'rb') as f:
+            for offset in self.offsets[start:stop]:
+                f.seek(offset)
+                yield self._read(f)
+
+    def game(self, index):
+        # The record of game `index` (game_rng index, not file position)
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[self.indices[index]])
+            return self._read(f)
+
+    @staticmethod
+    def _read(f):
+        index, flags, seats, starting_seat, moves = GAME_HEADER.unpack(f.read(GAME_HEADER.size))
+        seating = list(f.read(seats))
+        return GameTrace(index, flags, seating, starting_seat, f.read(moves))
+
+    def turn_limit_games(self):
+        # Indices of the games that stopped on the 100-turn limit
+        return [trace.index for trace in self.games() if trace.turn_limit]
+
+    def replay(self, trace):
+        # Rebuild a game from its record with scripted players; returns the finished Game, whose
+        # scoreboard.round_log is keyed by the scripted players (named as in the header)
+        moves = trace.decoded_moves()
+        players = [Player(name, ScriptedStrategy(moves)) for name in self.player_names]
+        game = Game(players, rng=game_rng(self.seed, trace.index), **self.game_options)
+        if [self.player_names.index(player.name) for player in game.players] != trace.seating:
+            raise ValueError(f"Game {trace.index} was dealt a different seating; the trace does not match this seed")
+        game.start_game()
+        return game
+
+    def iter_games(self, start=0, stop=None, players=None):
+        # Round logs of games start..stop rebuilt from the trace, keyed by player name, or by the
+        # given Player objects (one per header name, in that order)
+        keys = self.player_names if players is None else players
+        for trace in self.games(start, stop):
+            game = self.replay(trace)
+            key = {player: keys[self.player_names.index(player.name)] for player in game.scoreboard.scores}
+            yield [{key[player]: data for player, data in round_log.items()} for round_log in game.scoreboard.round_log]
+
+
+class ScriptedStrategy(PlayerStrategy):
+    # Plays the next recorded move; the decoded moves of all players share one iterator
+    def __init__(self, moves):
+        self.moves = moves
+
+    def make_a_move(self, player, game, observation):
+        move = next(self.moves)
+        if move is None:
+            player.called_dhumbal = True
+            if game.tracer.enabled:
+                game.tracer.emit('dhumbal', player=player.name, score=player.score)
+            return True
+        rank, count, from_graveyard = move
+        player.play_cards(player.rank_buckets[rank][:count])
+        player.draw_card(game.graveyard if from_graveyard else game.deck.cards, game)
+        return False
@@ -0,0 +1,172 @@
+from collections import defaultdict
+from functools import lru_cache
+import itertools
+from math import comb
+import numpy as np
+
+from cards import POOL_RANK_COUNTS, RANK_SCORE
+
+
+class HandDistribution:
+    # Exact distributions of k-card hands dealt from a deck with the given number of cards per rank
+    # value (a full deck by default: 4 of each rank from ace to king, 2 jokers), for k up to max_cards.
+    # A dynamic program over the ranks counts the hands by (cards, score, rank multiplicities) with
+    # exact integers; the tables built from it answer queries by lookup.
+    def __init__(self, rank_counts=POOL_RANK_COUNTS, max_cards=5):
+        self.rank_counts = tuple(rank_counts)
+        self.max_cards = max_cards
+        self.total_cards = sum(self.rank_counts)
+        max_score = max_cards * max(RANK_SCORE)
+
+        # states[(cards, score, multiplicities)] = number of hands; multiplicities is the sorted tuple of
+        # how many cards of each rank present the hand holds, e.g. (2, 1, 1, 1) for one pair in five
+        states = {(0, 0, ()): 1}
+        for rank, available in enumerate(self.rank_counts):
+            next_states = defaultdict(int)
+            for (cards, score, multiplicities), ways in states.items():
+                for taken in range(min(available, max_cards - cards) + 1):
+                    key = (cards + taken, score + taken * RANK_SCORE[rank],
+                           tuple(sorted(multiplicities + (taken,), reverse=True)) if taken else multiplicities)
+                    next_states[key] += ways * comb(available, taken)
+            states = next_states
+
+        # Exact counts, and the probability tables built from them
+        self.score_counts = [[0] * (max_score + 1) for _ in range(max_cards + 1)]
+        self.pattern_counts = [defaultdict(int) for _ in range(max_cards + 1)]
+        for (cards, score, multiplicities), ways in states.items():
+            self.score_counts[cards][score] += ways
+            self.pattern_counts[cards][multiplicities] += ways
+        self.score_pmf = np.array([[ways / self.hands(k) for ways in self.score_counts[k]] for k in range(max_cards + 1)])
+        self.score_cdf = np.array([[ways / self.hands(k) for ways in itertools.accumulate(self.score_counts[k])] for k in range(max_cards + 1)])
+
+    def hands(self, k):
+        return comb(self.total_cards, k)
+
+    def prob_score_at_most(self, k, score):
+        # P(a k-card hand scores <= score), e.g. the chance a fresh deal is already at a Dhumbal threshold
+        if score < 0:
+            return 0.0
+        return float(self.score_cdf[k, min(score, self.score_cdf.shape[1] - 1)])
+
+    def mean_score(self, k):
+        return float(self.score_pmf[k] @ np.arange(self.score_pmf.shape[1]))
+
+    def pattern_pmf(self, k):
+        # {sorted rank multiplicities: probability} for k-card hands
+        return {pattern: ways / self.hands(k) for pattern, ways in sorted(self.pattern_counts[k].items(), reverse=True)}
+
+    def prob_group_of_at_least(self, k, size):
+        # P(a k-card hand holds at least `size` cards of one rank), the chance of a multi-card play
+        return sum(ways for pattern, ways in self.pattern_counts[k].items() if pattern and pattern[0] >= size) / self.hands(k)
+
+    def expected_min_score(self, k, opponents):
+        # Expected lowest score among `opponents` k-card hands, treating the hands as independent
+        # deals from a full deck (they share one, so this is an approximation)
+        return self.expected_min_hand_score([(k, 0)] * opponents)
+
+    def expected_min_hand_score(self, hands):
+        # Expected lowest score among hands given as (unknown cards, known score): each is the known
+        # score plus that many cards dealt from rank_counts, independently of the others as above
+        return min_hand_score(self.score_cdf, hands)
+
+
+def min_hand_score(score_cdf, hands):
+    # expected_min_hand_score over a score_cdf table ([cards, score] -> P(score <= s))
+    if not hands:
+        return float('inf')
+    width = score_cdf.shape[1]
+    survival = np.ones(max(known for _, known in hands) + width)  # P(min > s)
+    for unknown, known in hands:
+        # P(hand > s) is 1 below the known score, and 0 past the highest score the unknown cards reach
+        survival[known:known + width] *= 1 - score_cdf[unknown]
+        survival[known + width:] = 0
+    return float(survival.sum())
+
+
+# The packed rows of the last score_cdf_table built for each max_cards, as (cards per score, digit
+# bits, rows). Successive queries during a round are a few cards apart, so the next table is usually
+# cheaper to reach from this one than to build.
+_last_rows = {}
+INCREMENTAL_CARDS = 16  # most cards to add or remove before rebuilding instead
+
+
+def _deal_in(rows, count, shift):
+    # Add `count` cards whose score is `shift` bits to the rows: multiply by (1 + x y^score)^count
+    ways = [comb(count, t) for t in range(min(count, len(rows) - 1) + 1)]
+    for k in range(len(rows) - 1, 0, -1):
+        # rows[k - t] still hold the pool before these cards
+        row = rows[k]
+        for t in range(1, min(count, k) + 1):
+            row += ways[t] * (rows[k - t] << (shift * t))
+        rows[k] = row
+
+
+def _deal_out(rows, count, shift):
+    # Remove `count` such cards: divide by (1 + x y^score) once per card
+    for _ in range(count):
+        for k in range(1, len(rows)):
+            rows[k] -= rows[k - 1] << shift
+
+
+@lru_cache(maxsize=4096)
+def score_cdf_table(rank_counts, max_cards):
+    # HandDistribution(rank_counts, max_cards).score_cdf without the multiplicity patterns, cheap
+    # enough to build per query: a dynamic program over (cards, score) only, with each row of counts
+    # (k cards, by score) packed into one Python int, a `bits`-bit digit per score, so dealing t cards
+    # of score s is a shift by t * s digits. Only the number of cards of each score matters, and the
+    # rows are updated from the previous table when that is close. Cached by its arguments and
+    # shared, so callers must not write to it.
+    by_score = [0] * (max(RANK_SCORE) + 1)
+    for rank, available in enumerate(rank_counts):
+        by_score[RANK_SCORE[rank]] += available
+    total_cards = sum(rank_counts)
+    hands = [comb(total_cards, k) for k in range(max_cards + 1)]
+    words = -(-max(hands).bit_length() // 64)  # no count exceeds the number of hands
+    bits = 64 * words
+
+    last = _last_rows.get(max_cards)
+    if last is not None and last[1] == bits and sum(abs(now - then) for now, then in zip(by_score, last[0])) <= INCREMENTAL_CARDS:
+        rows = list(last[2])
+        for score, (now, then) in enumerate(zip(by_score, last[0])):
+            if now > then:
+                _deal_in(rows, now - then, bits * score)
+            elif now < then:
+                _deal_out(rows, then - now, bits * score)
+    else:
+        rows = [1] + [0] * max_cards
+        for score, available in enumerate(by_score):
+            if available:
+                _deal_in(rows, available, bits * score)
+    _last_rows[max_cards] = (by_score, bits, rows)
+
+    width = max_cards * max(RANK_SCORE) + 1
+    data = b''.join(row.to_bytes(width * words * 8, 'little') for row in rows)
+    counts = np.frombuffer(data, dtype='<u8').reshape(max_cards + 1, width, words) @ (2.0 ** (64 * np.arange(words)))
+    table = np.cumsum(counts, axis=1) / np.array(hands, dtype=float)[:, None]
+    table.flags.writeable = False
+    return table
+
+
+def expected_opponent_min_score(observation):
+    # Expected lowest opponent hand score at this point of the round, from the observing player's
+    # seat (see observation.Observation; the table must keep the card counts). Each opponent holds the
+    # cards they were seen taking from the graveyard plus the rest of their hand dealt from the cards
+    # this player has not seen, so the estimate sharpens as the round goes on; at the deal it is
+    # expected_min_score over the deck less this player's hand and the graveyard top. The score tables
+    # come from score_cdf_table, cached by the unseen counts.
+    opponents = [(size - known_cards, known_score) for size, known_cards, known_score in observation.opponent_known_totals]
+    if not opponents:
+        return float('inf')
+    table = score_cdf_table(observation.unseen_counts, max(unknown for unknown, _ in opponents))
+    return min_hand_score(table, opponents)
+
+
+def control_variate_estimate(values, controls, control_mean):
+    # Monte Carlo estimate of E[values] corrected with a control that has a known exact mean (say the
+    # score of the dealt hand, whose mean is HandDistribution.mean_score). Returns (estimate, standard error).
+    values = np.asarray(values, dtype=float)
+    controls = np.asarray(controls, dtype=float)
+    covariance = np.cov(values, controls)
+    beta = covariance[0, 1] / covariance[1, 1] if covariance[1, 1] > 0 else 0.0
+    adjusted = values - beta * (controls - control_mean)
+    return float(adjusted.mean()), float(adjusted.std(ddof=1) / np.sqrt(len(adjusted)))
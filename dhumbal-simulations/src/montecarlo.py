@@ -1,32 +1,285 @@
 from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+import math
 import numpy as np
 import matplotlib.pyplot as plt
 
-from game import Game
+from analysis import analyze_columns
+from batch_game import BatchGame
+from game import Game, game_rng
+from game_trace import MoveRecorder, TraceReader, TraceWriter
 from player import Player, DiscardBiggestStrategy, MinimizeCardNumberStrategy
+from result_store import COLUMNS, ResultStore, columns_from_results
+from streaming import ResultAccumulator, proportion_half_width
 
 class MonteCarlo:
-    def __init__(self, players, num_simulations, verbose=False):
+    def __init__(self, players, num_simulations, verbose=False, stream=False, store=None, profiler=None, trace=None,
+                 reshuffle_refills=False, hand_size=5, decks=1, jokers=2, elimination_score=108):
         self.num_simulations = num_simulations
         self.players = players
         self.verbose = verbose
-        self.game = Game(self.players, self.verbose) # Game object used to run simulations
+        # reshuffle_refills: shuffle the recycled graveyard when a deck runs out; hand_size, decks, jokers
+        # and elimination_score: the table rules (see Game). Every engine plays by them.
+        self.game_options = {'reshuffle_refills': reshuffle_refills, 'hand_size': hand_size, 'decks': decks, 'jokers': jokers,
+                             'elimination_score': elimination_score}
+        self.game = Game(self.players, self.verbose, **self.game_options) # Game object used to run simulations
         self.player_stats = {} # intermediate data structure to store data for each player
         self.player_statistics = {} #summary of performance across all games
+        # stream=True folds every finished game into online accumulators instead of keeping its round log
+        self.stream = stream
+        self.accumulator = ResultAccumulator() if stream else None
+        # store: a ResultStore (or a directory for one) that finished games are appended to instead of self.results
+        if isinstance(store, str):
+            store = ResultStore(store, [player.name for player in self.canonical_players()])
+        self.store = store
+        # profiler: a profiling.GameProfiler attached to every game of a serial run_simulation
+        self.profiler = profiler
+        # trace: path of a game_trace file that run_simulation records every game's moves to. With
+        # stream=True and no store, iter_results rebuilds the games from it.
+        self.trace = trace
+        self.traced = False  # whether the last run recorded its games to the trace
+        # Engine that played the last run: 'game' (Game objects, whose games replay_game can rebuild
+        # from self.seed) or 'batch' (the vectorized BatchGame, whose games cannot be replayed or traced)
+        self.engine = None
+        self.results = []
+        # (results, columns): the flat columns of a batch run's results, kept from the vectorized
+        # engine so result_columns does not rebuild them
+        self._columns = None
         
         
-    def run_simulation(self):
+    def run_simulation(self, workers=None, chunksize=None, seed=None):
+        # Game i is played with its own RNG, game_rng(self.seed, i), derived from the master `seed`
+        # (fresh entropy if None), so any game can be replayed by index and workers > 1 (see
+        # run_parallel_simulation) gives the same games as a serial run
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.engine = 'game'
+        self.traced = self.trace is not None
+        self._start()
+        if workers is not None and workers > 1:
+            if self.profiler is not None:
+                raise ValueError("Profiling only covers serial runs")
+            return self.run_parallel_simulation(workers, chunksize)
+        writer = self._trace_writer()
+        names = [player.name for player in self.players]
         results = []
         for i in range(self.num_simulations):
-            self.game = Game(self.players, self.verbose)  # Reset the game
+            if self.profiler is not None:
+                # The profiler instruments one Game at a time
+                self.game = Game(self.players, self.verbose, rng=game_rng(self.seed, i), profiler=self.profiler,
+                                 **self.game_options)
+            else:
+                self.game.reset(game_rng(self.seed, i))  # Reset the game
+            recorder = MoveRecorder(self.game, i, names) if writer is not None else None
             self.game.start_game()
-            results.append(self.game.scoreboard.round_log)
+            if recorder is not None:
+                writer.append(recorder.encode())
+            self._collect(results, self.game.scoreboard.round_log)
             print(f'Current iteration: {i} / {self.num_simulations}', end='\r')
+        if writer is not None:
+            writer.close()
+        self._finish(results)
+
+    def _trace_writer(self):
+        # Traces record the players in the order Game gets them, which fixes the seating of every game
+        if self.trace is None:
+            return None
+        return TraceWriter(self.trace, [player.name for player in self.players], self.seed, self.game_options)
+
+    def replay_game(self, index, tracer=None):
+        # Play game `index` of the last run_simulation again, e.g. with a tracing.RingBufferSink as
+        # tracer to see every move; returns the finished Game
+        if self.engine != 'game':
+            raise ValueError("Only games played by run_simulation or an object-engine run_adaptive can be replayed"
+                             if self.engine == 'batch' else "No games have been played yet")
+        game = Game(self.players, self.verbose, rng=game_rng(self.seed, index), tracer=tracer, **self.game_options)
+        game.start_game()
+        return game
+
+    def _start(self):
+        # Every run starts over, as self.results does: a streamed run only folds in its own games
+        if self.stream:
+            self.accumulator = ResultAccumulator()
+
+    def _collect(self, results, round_logs):
+        if self.stream:
+            self.accumulator.add_game(round_logs)
+        if self.store is not None:
+            self.store.append_game(round_logs)
+        elif not self.stream:
+            results.append(round_logs)
+
+    def _finish(self, results):
         self.results = results
+        if self.store is not None:
+            self.store.flush()
+
+    def iter_results(self, start=0, stop=None):
+        # Round logs of games start..stop, from the result store if there is one
+        if self.store is not None:
+            players_by_name = {player.name: player for player in self.players}
+            return self.store.iter_games(start, stop, players=[players_by_name[name] for name in self.store.player_names])
+        if self.stream and self.traced:
+            return TraceReader(self.trace).iter_games(start, stop, players=self.players)
+        return iter(self.results[start:stop])
 
-    def analyze_results(self):
+    def result_columns(self):
+        # (player names, flat ResultStore-layout columns) of every game played so far
+        if self.store is not None:
+            self.store.flush()
+            return self.store.player_names, self.store.columns()
+        names = [player.name for player in self.canonical_players()]
+        if self._columns is not None and self._columns[0] is self.results:
+            return names, self._columns[1]
+        return names, columns_from_results(self.results, names)
 
-        mc_results = self.results
+    def canonical_players(self):
+        # The vectorized engine and result stores index the players sorted by name, so seeded batch runs
+        # do not depend on the caller's order
+        return sorted(self.players, key=lambda player: player.name)
+
+    def vectorizable(self):
+        # Whether every player's strategy can be played by the vectorized engine (run_batch_simulation)
+        return BatchGame.supports(self.players)
+
+    def run_parallel_simulation(self, workers, chunksize=None):
+        # Split the games into chunks, each played by a worker process on its own copy of the
+        # players. Every game still gets game_rng(self.seed, index), so the chunking and worker
+        # scheduling do not change the games.
+        if chunksize is None:
+            chunksize = max(1, math.ceil(self.num_simulations / (workers * 4)))
+        starts = list(range(0, self.num_simulations, chunksize))
+        self._start()
+        chunks = [min(chunksize, self.num_simulations - start) for start in starts]
+
+        # Worker logs are keyed by player name; map them back onto our own Player objects
+        players_by_name = {player.name: player for player in self.players}
+        # Workers only stream when nothing needs the individual games
+        worker_stream = self.stream and self.store is None
+        writer = self._trace_writer()
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_logs = executor.map(_play_games, [self.players] * len(chunks), [self.verbose] * len(chunks), [self.seed] * len(chunks),
+                                      starts, chunks, [worker_stream] * len(chunks), [writer is not None] * len(chunks),
+                                      [self.game_options] * len(chunks))
+            for i, logs in enumerate(chunk_logs):
+                if writer is not None:
+                    # Chunks come back in order, so the records stay in game order
+                    logs, records = logs
+                    for record in records:
+                        writer.append(record)
+                if worker_stream:
+                    self.accumulator.merge(logs)
+                else:
+                    for round_logs in logs:
+                        self._collect(results, [{players_by_name[name]: data for name, data in round_log.items()} for round_log in round_logs])
+                print(f'Completed chunk: {i + 1} / {len(chunks)}', end='\r')
+        if writer is not None:
+            writer.close()
+        self._finish(results)
+
+    def run_batch_simulation(self, batch_size=100000, seed=None):
+        # Play the games with the vectorized engine in batch_game.py, `batch_size` games at a time.
+        # Only DiscardBiggestStrategy and MinimizeCardNumberStrategy players are supported.
+        if self.trace is not None:
+            raise ValueError("Traces record Game moves; the vectorized engine has none to record")
+        batches = [min(batch_size, self.num_simulations - start) for start in range(0, self.num_simulations, batch_size)]
+        seeds = np.random.SeedSequence(seed)
+        self.seed = seeds.entropy
+        self.engine = 'batch'
+        self.traced = False
+        self._start()
+        results = []
+        kept = []  # columns of the games kept in results, with game ids numbered across batches
+        for i, (num_games, child) in enumerate(zip(batches, seeds.spawn(len(batches)))):
+            batch = BatchGame(self.canonical_players(), num_games, seed=child, **self.game_options)
+            batch.play()
+            columns = batch.columns()
+            if self.store is not None and not self.stream:
+                # The batch's player indices already follow the store's (sorted) player names
+                self.store.append_columns(columns, num_games)
+            else:
+                if self.store is None and not self.stream:
+                    kept.append(dict(columns, game=columns['game'] + len(results)))
+                for round_logs in batch.round_logs(columns):
+                    self._collect(results, round_logs)
+            print(f'Completed batch: {i + 1} / {len(batches)}', end='\r')
+        self._finish(results)
+        if kept:
+            self._columns = (self.results, {name: np.concatenate([columns[name] for columns in kept]).astype(dtype, copy=False)
+                                            for name, dtype in COLUMNS})
+
+    def run_adaptive(self, win_half_width=None, score_half_width=None, confidence=0.95, batch_size=1000,
+                     max_games=None, seed=None):
+        # Play batches of games until every target is met: the `confidence` interval of each player's win
+        # probability is within +-win_half_width (0.005 for +-0.5%) and that of each player's mean round
+        # score within +-score_half_width points. Gives up at max_games (default num_simulations).
+        # Rounds of one game are not independent, so the score interval is a guide rather than exact.
+        # Returns the number of games played, which also becomes self.num_simulations.
+        assert win_half_width is not None or score_half_width is not None
+        max_games = self.num_simulations if max_games is None else max_games
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        vectorized = self.vectorizable()
+        if vectorized and self.trace is not None:
+            raise ValueError("Traces record Game moves; the vectorized engine has none to record")
+        self.engine = 'batch' if vectorized else 'game'
+        self.traced = False
+
+        self._start()
+        accumulator = self.accumulator if self.stream else ResultAccumulator()
+        players_by_name = {player.name: player for player in self.players}
+        seeds = np.random.SeedSequence(seed)
+        self.seed = seeds.entropy
+        results = []
+        self.half_widths = {}
+        done = False
+        while accumulator.games < max_games:
+            num_games = min(batch_size, max_games - accumulator.games)
+            child = seeds.spawn(1)[0]
+            if vectorized:
+                round_logs = BatchGame(self.canonical_players(), num_games, seed=child, **self.game_options).run()
+            else:
+                round_logs = [[{players_by_name[name]: data for name, data in round_log.items()} for round_log in logs]
+                              for logs in _play_games(self.players, self.verbose, self.seed, accumulator.games, num_games,
+                                                          game_options=self.game_options)]
+            for logs in round_logs:
+                if not self.stream:
+                    accumulator.add_game(logs)
+                self._collect(results, logs)
+
+            self.half_widths = {name: {'win_probability': proportion_half_width(accumulator.positions[name][1], accumulator.games, z),
+                                       'mean_score': stats.half_width(z)}
+                                for name, stats in accumulator.scores.items()}
+            done = all((win_half_width is None or widths['win_probability'] <= win_half_width) and
+                       (score_half_width is None or widths['mean_score'] <= score_half_width)
+                       for widths in self.half_widths.values())
+            print(f'Played {accumulator.games} games', end='\r')
+            if done:
+                break
+        self._finish(results)
+        self.num_simulations = accumulator.games
+        print(f'Stopped after {accumulator.games} games' + ('' if done else ' without meeting every target'))
+        return accumulator.games
+
+    def analyze_results(self, vectorized=None):
+        # vectorized=True runs the NumPy path in analysis.py over flat per-round columns; it is the
+        # default for result stores, whose columns are already on disk
+
+        if self.stream:
+            # Raw scores and positions were never stored, only their summaries
+            self.player_statistics = self.accumulator.player_statistics()
+            for player_name in self.player_statistics:
+                self.player_stats.setdefault(player_name, {})
+            return
+
+        if vectorized is None:
+            vectorized = self.store is not None
+        if vectorized:
+            names, columns = self.result_columns()
+            self.player_stats, self.player_statistics = analyze_columns(columns, names)
+            return
+
+        mc_results = self.iter_results()
         for game_list in mc_results:
             # Temporary structure to store data for position calculation
             temp_positions = {}
@@ -68,14 +321,18 @@ class MonteCarlo:
                                     'variance': variance, 'outcome_percentages': outcome_percentages}
             
     def player_position_probabilities(self):
+        if self.stream:
+            return self.accumulator.position_probabilities()
+
         position_probabilities = {}
 
         # Calculate probabilities
         for player_name, stats in self.player_stats.items():
-            total_games = len(stats['positions'])
-            position_counts = Counter(stats['positions'])
-            sorted_positions = OrderedDict(sorted(position_counts.items()))
-            position_probabilities[player_name] = {position: count / total_games for position, count in sorted_positions.items()}
+            positions = np.asarray(stats['positions'])
+            total_games = len(positions)
+            position_counts = np.bincount(positions)
+            position_probabilities[player_name] = {position: int(position_counts[position]) / total_games
+                                                   for position in np.flatnonzero(position_counts).tolist()}
 
         # Sort by player names
         sorted_position_probabilities = OrderedDict(sorted(position_probabilities.items()))
@@ -93,6 +350,30 @@ class MonteCarlo:
         plt.title('Player Performance in Monte Carlo Simulations')
         plt.show()
     
+def _play_games(players, verbose, seed, start, num_games, stream=False, record=False, game_options=None):
+    # Process pool entry point: plays games start..start+num_games with the worker's copy of the players.
+    # Round logs are keyed by player name, since Player objects do not survive pickling by identity.
+    # When streaming, the games are folded into a ResultAccumulator and only that is sent back.
+    # record=True also returns the games' game_trace records, as (result, records).
+    accumulator = ResultAccumulator()
+    logs = []
+    records = []
+    names = [player.name for player in players]
+    game = Game(players, verbose, **(game_options or {}))
+    for index in range(start, start + num_games):
+        game.reset(game_rng(seed, index))
+        recorder = MoveRecorder(game, index, names) if record else None
+        game.start_game()
+        if recorder is not None:
+            records.append(recorder.encode())
+        if stream:
+            accumulator.add_game(game.scoreboard.round_log)
+            continue
+        logs.append([{player.name: data for player, data in round_log.items()} for round_log in game.scoreboard.round_log])
+    result = accumulator if stream else logs
+    return (result, records) if record else result
+
+
 if __name__ == '__main__':
     
     verbose = False
@@ -0,0 +1,131 @@
+from cards import CARD_RANK
+
+
+class Observation:
+    # Read-only view of the game from one player's seat, handed to PlayerStrategy.make_a_move. Game
+    # builds one per player and keeps the state behind it up to date as cards move (the hand's rank
+    # buckets and score in Player, the counts of cards seen face up in Game.seen_ranks), so every
+    # field is a lookup rather than a scan of hands or piles. The card counts (seen onwards) are only
+    # kept for a table where some strategy sets PlayerStrategy.counts_cards.
+    __slots__ = ('_player', '_game')
+
+    def __init__(self, player, game):
+        self._player = player
+        self._game = game
+
+    @property
+    def turn(self):
+        return self._game.turn
+
+    @property
+    def round(self):
+        return self._game.round
+
+    @property
+    def top_rank(self):
+        # Rank of the top graveyard card, the one a graveyard draw takes
+        return CARD_RANK[self._game.graveyard[-1].code]
+
+    @property
+    def hand_score(self):
+        return self._player.score
+
+    @property
+    def hand_size(self):
+        return len(self._player.hand)
+
+    def rank_count(self, rank):
+        # Cards of rank value `rank` in hand
+        return len(self._player.rank_buckets[rank])
+
+    @property
+    def hand_rank_counts(self):
+        return tuple(len(bucket) for bucket in self._player.rank_buckets)
+
+    def highest_rank(self, exclude=None):
+        return self._player.highest_rank(exclude)
+
+    @property
+    def deck_remaining(self):
+        return len(self._game.deck.cards)
+
+    @property
+    def graveyard_size(self):
+        return len(self._game.graveyard)
+
+    @property
+    def opponent_hand_sizes(self):
+        # Hand sizes of the other players still in the game, in turn order after this player
+        return tuple(len(opponent.hand) for opponent in self._opponents())
+
+    def seen(self, rank):
+        # Cards of rank value `rank` that have been face up on the graveyard this round
+        self._check_counts()
+        return self._game.seen_ranks[rank]
+
+    @property
+    def seen_counts(self):
+        self._check_counts()
+        return tuple(self._game.seen_ranks)
+
+    def graveyard_count(self, rank):
+        self._check_counts()
+        return self._game.graveyard_ranks[rank]
+
+    def unseen(self, rank):
+        # Cards of rank value `rank` whose whereabouts this player cannot know: in the deck or in an
+        # opponent's hand, other than those the opponent was seen taking from the graveyard
+        self._check_counts()
+        game = self._game
+        player = self._player
+        return (game.deck.rank_counts[rank] - len(player.rank_buckets[rank]) - game.graveyard_ranks[rank]
+                - (game.known_ranks[rank] - player.known_ranks[rank]))
+
+    @property
+    def unseen_counts(self):
+        self._check_counts()
+        game = self._game
+        player = self._player
+        return tuple(total - len(bucket) - graveyard - known + own for total, bucket, graveyard, known, own
+                     in zip(game.deck.rank_counts, player.rank_buckets, game.graveyard_ranks, game.known_ranks, player.known_ranks))
+
+    @property
+    def unseen_cards(self):
+        # sum(unseen_counts), without the scan
+        self._check_counts()
+        game = self._game
+        player = self._player
+        return (game.deck.total_cards - len(player.hand) - len(game.graveyard)
+                - (game.known_cards - player.known_cards))
+
+    @property
+    def mean_unseen_score(self):
+        # Expected score of an unseen card, e.g. the next deck draw; 0 if every card is accounted for
+        game = self._game
+        player = self._player
+        cards = self.unseen_cards  # checks the counts are kept
+        if not cards:
+            return 0
+        return (game.deck.total_score - player.score - game.graveyard_score - (game.known_score - player.known_score)) / cards
+
+    @property
+    def opponent_known_totals(self):
+        # Per opponent, in turn order: (hand size, number and score of the cards they were seen taking)
+        self._check_counts()
+        return tuple((len(opponent.hand), opponent.known_cards, opponent.known_score) for opponent in self._opponents())
+
+    @property
+    def opponent_known_counts(self):
+        # Per opponent, in turn order: cards of each rank value they were seen taking and still hold
+        self._check_counts()
+        return tuple(tuple(opponent.known_ranks) for opponent in self._opponents())
+
+    def _check_counts(self):
+        if not self._game.counts_cards:
+            raise ValueError(f"the card counts are not kept for this table; set counts_cards on "
+                             f"{type(self._player.strategy).__name__} to read them")
+
+    def _opponents(self):
+        players = self._game.players
+        index = players.index(self._player)
+        return [players[(index + offset) % len(players)] for offset in range(1, len(players))]
@@ -0,0 +1,152 @@
+import math
+import numpy as np
+
+from analysis import final_positions
+from batch_game import BatchGame
+from game import Game, game_rng
+from streaming import game_positions
+
+GOLDEN = np.uint64(0x9e3779b97f4a7c15)
+REFILL_STREAM = 1 << 32  # game_keys streams from here on shuffle refills, see refill_stream
+
+
+def mix(x):
+    # splitmix64 finalizer on uint64 arrays (wrapping arithmetic)
+    x = np.asarray(x, dtype=np.uint64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def game_keys(seed, games, stream, size):
+    # (len(games), size) pseudo-random keys that depend only on (seed, game, stream, column)
+    base = mix(mix(np.uint64(seed) + np.asarray(games, dtype=np.uint64) * GOLDEN) + np.asarray(stream, dtype=np.uint64) * GOLDEN)
+    return mix(base[:, None] + np.arange(size, dtype=np.uint64) * GOLDEN)
+
+
+def refill_stream(round_index, refill):
+    # game_keys stream of refill shuffle `refill` (from 0) of round `round_index`, past the deck streams
+    return REFILL_STREAM + (np.asarray(round_index, dtype=np.uint64) << np.uint64(16)) + np.asarray(refill, dtype=np.uint64)
+
+
+class PairedBatchGame(BatchGame):
+    # BatchGame whose seatings, starting seats, decks and refill shuffles depend only on (seed, game,
+    # round, refill), not on which games happen to share a step. Two batches with the same seed and player
+    # names deal game g the same seating and the same deck in every round, and shuffle its n-th refill of
+    # a round with the same keys, whatever their strategies do. game_options are the table rules, as in
+    # BatchGame.
+    def __init__(self, players, num_games, seed=0, first_game=0, **game_options):
+        # Every draw BatchGame makes from its rng is overridden below
+        super().__init__(players, num_games, **game_options)
+        self.seed = seed
+        self.first_game = first_game
+        self.refills = np.zeros(num_games, dtype=np.int64)  # refills of each game's current round
+
+    def _new_seating(self, games):
+        # Stream 0: seating, stream 1: starting seat, stream 2 + r: deck of round r
+        ids = self.first_game + np.arange(games)
+        return np.argsort(game_keys(self.seed, ids, 0, self.num_seats), axis=1)
+
+    def _new_starting_seats(self, games):
+        ids = self.first_game + np.arange(games)
+        return (game_keys(self.seed, ids, 1, 1)[:, 0] % np.uint64(self.num_seats)).astype(np.int64)
+
+    def _new_decks(self, games):
+        keys = game_keys(self.seed, self.first_game + games, 2 + self.round[games], len(self.deck_ranks))
+        return self.deck_ranks[np.argsort(keys, axis=1)]
+
+    def _start_rounds(self, idx, current_seats):
+        self.refills[idx] = 0
+        super()._start_rounds(idx, current_seats)
+
+    def _refill_keys(self, games):
+        # The top 53 bits of each key, as a float in [0, 1)
+        keys = game_keys(self.seed, self.first_game + games, refill_stream(self.round[games], self.refills[games]), self.deck.shape[1])
+        self.refills[games] += 1
+        return (keys >> np.uint64(11)) * 2.0 ** -53
+
+
+class PairedGame(Game):
+    # Game for the object-engine comparison: its seating and decks come from game_rng(seed, game), and its
+    # refill shuffles from the keys PairedBatchGame uses, so a refill in one table does not change the
+    # decks of the later rounds or the refills of the other table
+    def __init__(self, players, seed=0, **game_options):
+        super().__init__(players, **game_options)
+        self.seed = seed
+
+    def play_game(self, index):
+        self.index = index
+        self.refill_round, self.refills = None, 0
+        self.reset(game_rng(self.seed, index))
+        self.start_game()
+
+    def shuffle_refill(self):
+        if self.refill_round != self.round:
+            self.refill_round, self.refills = self.round, 0
+        cards = self.deck.cards
+        keys = game_keys(self.seed, [self.index], refill_stream(self.round, self.refills), len(cards))[0]
+        self.refills += 1
+        cards[:] = [cards[i] for i in np.argsort(keys)]
+
+
+class PairedComparison:
+    # Common random numbers: both tables play the same games, seat for seat and deck for deck, so the
+    # per-game differences in finishing position cancel most of the luck of the deal. Tables must have
+    # the same player names; players are seated by name, as in MonteCarlo.canonical_players.
+    # game_options are the table rules both tables play by (see game.GAME_OPTIONS).
+    def __init__(self, players_a, players_b, num_games, batch_size=100000, **game_options):
+        self.players_a = sorted(players_a, key=lambda player: player.name)
+        self.players_b = sorted(players_b, key=lambda player: player.name)
+        self.names = [player.name for player in self.players_a]
+        if self.names != [player.name for player in self.players_b]:
+            raise ValueError("Both tables need the same player names")
+        self.num_games = num_games
+        self.batch_size = batch_size
+        self.game_options = game_options
+        self.vectorized = BatchGame.supports(self.players_a) and BatchGame.supports(self.players_b)
+
+    def run(self, seed=0):
+        # Fills self.positions_a/self.positions_b ((games, players) finishing positions) and returns summary()
+        if self.vectorized:
+            self.positions_a, self.positions_b = (self._batch_positions(players, seed) for players in (self.players_a, self.players_b))
+        else:
+            self.positions_a, self.positions_b = (np.zeros((self.num_games, len(self.names))) for _ in range(2))
+            games = (PairedGame(self.players_a, seed, **self.game_options), PairedGame(self.players_b, seed, **self.game_options))
+            for g in range(self.num_games):
+                for game, positions in zip(games, (self.positions_a, self.positions_b)):
+                    game.play_game(g)
+                    positions[g] = np.nan
+                    for player, position in game_positions(game.scoreboard.round_log).items():
+                        positions[g, self.names.index(player.name)] = position
+                print(f'Current iteration: {g} / {self.num_games}', end='\r')
+        return self.summary()
+
+    def _batch_positions(self, players, seed):
+        positions = np.full((self.num_games, len(self.names)), np.nan)
+        for first_game in range(0, self.num_games, self.batch_size):
+            num_games = min(self.batch_size, self.num_games - first_game)
+            batch = PairedBatchGame(players, num_games, seed=seed, first_game=first_game, **self.game_options)
+            batch.play()
+            game, player, position = final_positions(batch.columns(), len(self.names))
+            positions[first_game + game, player] = position
+        return positions
+
+    def summary(self):
+        # Per player, B minus A: mean finishing position difference (negative means B finishes higher)
+        # and win rate difference, each with its paired standard error. unpaired_standard_error is what
+        # two independent runs of the same size would give.
+        both = ~(np.isnan(self.positions_a).any(axis=1) | np.isnan(self.positions_b).any(axis=1))
+        a, b = self.positions_a[both], self.positions_b[both]
+        n = len(a)
+        summary = {}
+        for i, name in enumerate(self.names):
+            difference = b[:, i] - a[:, i]
+            wins = (b[:, i] == 1).astype(float) - (a[:, i] == 1).astype(float)
+            summary[name] = {'games': n,
+                             'mean_position_a': float(a[:, i].mean()), 'mean_position_b': float(b[:, i].mean()),
+                             'position_difference': float(difference.mean()),
+                             'standard_error': float(difference.std() / math.sqrt(n)),
+                             'unpaired_standard_error': float(math.sqrt((a[:, i].var() + b[:, i].var()) / n)),
+                             'win_difference': float(wins.mean()),
+                             'win_standard_error': float(wins.std() / math.sqrt(n))}
+        return summary
@@ -1,14 +1,38 @@
 from abc import ABC, abstractmethod
+from cards import CARD_RANK, CARD_SCORE, NUM_RANKS, RANK_SCORE
 from game import Game
+from hand_distribution import expected_opponent_min_score
+
+CALL_DHUMBAL = 'dhumbal'  # the decision to call Dhumbal, see PlayerStrategy.apply_decision
+
 
 class PlayerStrategy(ABC):
+    # Strategies that read the card counts of their Observation (seen, graveyard_count, unseen,
+    # opponent_known_*) set this; Game only keeps those counts when a player's strategy does
+    counts_cards = False
+
     @abstractmethod
-    def make_a_move(self, player, game):
+    def make_a_move(self, player, game, observation):
+        # observation: the player's observation.Observation of the game; strategies should read the
+        # game state from it rather than from game internals
         pass
 
     def get_cards_with_same_rank(self, player, card):
-        # Returns a list of cards from the player's hand that have the same rank as the first card in their hand
-        return [c for c in player.hand if c.rank.name == card.rank.name]
+        # Returns a list of cards from the player's hand that have the same rank as the given card
+        return list(player.rank_buckets[CARD_RANK[card.code]])
+
+    # Strategies can split make_a_move into a decide(observation) of their own, returning CALL_DHUMBAL
+    # or (rank value to play, whether to draw from the graveyard), and apply_decision
+    def apply_decision(self, player, game, decision):
+        if decision is CALL_DHUMBAL:
+            player.called_dhumbal = True
+            if game.tracer.enabled:
+                game.tracer.emit('dhumbal', player=player.name, score=player.score)
+            return True  # End the turn after calling Dhumbal
+        rank, from_graveyard = decision
+        player.play_cards(list(player.rank_buckets[rank]))
+        player.draw_card(game.graveyard if from_graveyard else game.deck.cards, game)
+        return False  # Continue the game
 
 class MinimizeCardNumberStrategy(PlayerStrategy):
     def __init__(self, dhumbal_threshold, draw_graveyard_threshold, try_to_pool_threshold, verbose=False):
@@ -20,52 +44,33 @@ class MinimizeCardNumberStrategy(PlayerStrategy):
         self.try_to_pool_threshold = try_to_pool_threshold
         self.verbose = verbose
 
-    def make_a_move(self, player, game: Game):
+    def make_a_move(self, player, game: Game, observation):
+        return self.apply_decision(player, game, self.decide(observation))
+
+    def decide(self, observation):
         # This function defines the player's move based on the current game state
         
         # Check if the player's score is low enough to call Dhumbal
-        if player.calculate_score() <= self.dhumbal_threshold:
-            player.called_dhumbal = True
-            print(player.name, f"called Dhumbal, as have {player.calculate_score()}") if self.verbose else None
-            return True  # End the turn after calling Dhumbal
+        if observation.hand_score <= self.dhumbal_threshold:
+            return CALL_DHUMBAL  # End the turn after calling Dhumbal
         
-        # Find the card with the highest rank in the player's hand
-        highest_rank_card = max(player.hand, key=lambda card: card.rank.value)
+        # Find the highest rank in the player's hand
+        highest_rank = observation.highest_rank()
 
         # Check if the top card in the graveyard has the same rank with any of cards in hand
         # yet within the threshold defined by try_to_pool_threshold
-        if (
-                game.graveyard[-1].rank.name in [card.rank.name for card in player.hand] and 
-                game.graveyard[-1].rank.value >= self.try_to_pool_threshold 
-            ):
-            # If so, find the second highest rank card in hand other than the top card in the graveyard
-            filtered_cards = [card for card in player.hand if card.rank.name != game.graveyard[-1].rank.name]
-            if len(filtered_cards) > 0:        
-                filtered_highest_rank_card = max(
-                    filtered_cards, 
-                    key=lambda card: card.rank.value
-                )
-                # Play cards with the same rank as the filtered highest card
-                player.play_cards(self.get_cards_with_same_rank(player, filtered_highest_rank_card))
-                player.draw_card(game.graveyard, game)
-                print(player.name, "drew card from graveyard, as want to pair") if self.verbose else None
-                return False  # Continue the game
-
-        # If not, play cards with the same rank as the highest card
-        player.play_cards(self.get_cards_with_same_rank(player, highest_rank_card))
-        
-        # Decide whether to draw a card from the graveyard or the deck
-        threshold_to_draw_from_graveyard = self.draw_graveyard_threshold - max(4, game.turn // 4)
-        if game.graveyard[-1].rank.value <= threshold_to_draw_from_graveyard:
-            # Draw from the graveyard if the top card's rank is above the threshold
-            player.draw_card(game.graveyard, game)
-            print(player.name, f"drew card from graveyard, as less than {threshold_to_draw_from_graveyard}") if self.verbose else None
-        else:
-            # Otherwise, draw from the deck
-            player.draw_card(game.deck.cards, game)
-            print(player.name, "drew card from deck, as graveyard high") if self.verbose else None
-    
-        return False  # Continue the game
+        top_rank = observation.top_rank
+        if top_rank >= self.try_to_pool_threshold and observation.rank_count(top_rank):
+            # If so, find the second highest rank in hand other than the top card in the graveyard
+            filtered_highest_rank = observation.highest_rank(exclude=top_rank)
+            if filtered_highest_rank is not None:
+                # Play cards with the filtered highest rank and take the graveyard top
+                return filtered_highest_rank, True
+
+        # If not, play cards with the highest rank, and decide whether to draw a card from the
+        # graveyard (if the top card's rank is within the threshold) or the deck
+        threshold_to_draw_from_graveyard = self.draw_graveyard_threshold - max(4, observation.turn // 4)
+        return highest_rank, top_rank <= threshold_to_draw_from_graveyard
 
 
 
@@ -73,44 +78,131 @@ class DiscardBiggestStrategy(PlayerStrategy):
     def __init__(self, dhumbal_threshold, draw_graveyard_threshold):
         self.dhumbal_threshold = dhumbal_threshold
         self.draw_graveyard_threshold = draw_graveyard_threshold
-    def make_a_move(self, player, game: Game):
+
+    def make_a_move(self, player, game: Game, observation):
+        return self.apply_decision(player, game, self.decide(observation))
+
+    def decide(self, observation):
         # Decide the next action based on the game state
         # This function can be expanded based on how the game state is defined
-        if player.calculate_score() <= self.dhumbal_threshold:
-            player.called_dhumbal = True
-            print(player.name, f"called Dhumbal, as have {player.calculate_score()}") if self.verbose else None
-            return True
-        
-        highest_rank_card = max(player.hand, key=lambda card: card.rank.value)
+        if observation.hand_score <= self.dhumbal_threshold:
+            return CALL_DHUMBAL
         
-        player.play_cards(self.get_cards_with_same_rank(player, highest_rank_card))
-        
-        threshold_to_draw_from_graveyard = self.draw_graveyard_threshold - max(4, game.turn // 4)        
-        if game.graveyard[-1].rank.value <= threshold_to_draw_from_graveyard:
-            player.draw_card(game.graveyard, game)
-            print(player.name, f"drew card from graveyard, as less than {threshold_to_draw_from_graveyard}") if self.verbose else None
-        else:
-            player.draw_card(game.deck.cards, game)
-            print(player.name, "drew card from deck, as grave bad") if self.verbose else None
-    
-        return False
+        threshold_to_draw_from_graveyard = self.draw_graveyard_threshold - max(4, observation.turn // 4)        
+        return observation.highest_rank(), observation.top_rank <= threshold_to_draw_from_graveyard
+
+
+class CardCountingStrategy(PlayerStrategy):
+    # Uses what has been seen face up: the cards left unseen by this player (see
+    # Observation.unseen) give the expected score of a deck draw, and the expected lowest opponent
+    # score (hand_distribution.expected_opponent_min_score) with the cards each was seen taking.
+    counts_cards = True
+
+    def __init__(self, dhumbal_threshold, call_margin=0, draw_margin=0, try_to_pool_threshold=2):
+        # dhumbal_threshold: highest hand score at which Dhumbal is called at all
+        # call_margin: how far below the expected lowest opponent score the hand must be to call
+        # draw_margin: how many points better than an average unseen card the graveyard top must be to take it
+        # try_to_pool_threshold: lowest rank worth keeping to pair with the graveyard top, as in MinimizeCardNumberStrategy
+        self.dhumbal_threshold = dhumbal_threshold
+        self.call_margin = call_margin
+        self.draw_margin = draw_margin
+        self.try_to_pool_threshold = try_to_pool_threshold
+
+    def make_a_move(self, player, game: Game, observation):
+        return self.apply_decision(player, game, self.decide(observation))
+
+    def decide(self, observation):
+        # The opponent estimate is only worked out for a hand low enough to call on, and below the
+        # lowest expected opponent score, which the expected lowest score never exceeds
+        score = observation.hand_score
+        if (score <= self.dhumbal_threshold and score + self.call_margin < self.lowest_expected_score(observation)
+                and score + self.call_margin < expected_opponent_min_score(observation)):
+            return CALL_DHUMBAL
+
+        top_rank = observation.top_rank
+        if top_rank >= self.try_to_pool_threshold and observation.rank_count(top_rank):
+            # Keep the cards that pair with the graveyard top and take it
+            other_rank = observation.highest_rank(exclude=top_rank)
+            if other_rank is not None:
+                return other_rank, True
+
+        return observation.highest_rank(), RANK_SCORE[top_rank] + self.draw_margin < observation.mean_unseen_score
+
+    @staticmethod
+    def lowest_expected_score(observation):
+        # Known cards count their score, the rest the expected score of an unseen card
+        mean_unseen = observation.mean_unseen_score
+        return min((known_score + (size - known_cards) * mean_unseen for size, known_cards, known_score in observation.opponent_known_totals),
+                   default=float('inf'))
 
 
 class Player:
     def __init__(self, name, strategy: PlayerStrategy, verbose=False):
         self.name = name
         self.strategy = strategy
+        # verbose is kept for compatibility; game output now goes through Game's tracer
         self.verbose = verbose
-        self.strategy.verbose = verbose
         self.hand = []
+        # Running hand score and the hand's cards grouped by rank value, kept in sync by
+        # draw_card / play_cards so score and same-rank lookups do not scan the hand
+        self.score = 0
+        self.rank_buckets = [[] for _ in range(NUM_RANKS)]
         self.called_dhumbal = False
         self.cards_to_be_played = []
+        # Cards of each rank value in hand that the other players saw this player take from the graveyard,
+        # with their number and score
+        self.known_ranks = [0] * NUM_RANKS
+        self.known_cards = 0
+        self.known_score = 0
+
+    def reset_hand(self):
+        self.hand.clear()
+        for bucket in self.rank_buckets:
+            bucket.clear()
+        self.score = 0
+        self.known_ranks = [0] * NUM_RANKS
+        self.known_cards = 0
+        self.known_score = 0
 
     def draw_card(self, cards, game: Game):
         # Draw a card from the deck and add it to the player's hand
+        # (the graveyard is only empty while the cards are dealt, which Game traces as one event)
+        traced = game.tracer.enabled and game.graveyard
         if cards:
-            self.hand.append(cards.pop())
-            print(self.name, "drew card", self.hand[-1]) if self.verbose else None
+            card = cards.pop()
+            rank = CARD_RANK[card.code]
+            score = CARD_SCORE[card.code]
+            self.hand.append(card)
+            self.rank_buckets[rank].append(card)
+            self.score += score
+            if game.counts_cards and cards is game.graveyard:
+                # Everyone saw which card was taken
+                game.graveyard_ranks[rank] -= 1
+                game.graveyard_score -= score
+                game.known_ranks[rank] += 1
+                game.known_cards += 1
+                game.known_score += score
+                self.known_ranks[rank] += 1
+                self.known_cards += 1
+                self.known_score += score
+            if traced:
+                game.tracer.emit('draw', player=self.name, source='graveyard' if cards is game.graveyard else 'deck', card=str(card))
+        if traced and self.cards_to_be_played:
+            game.tracer.emit('play', player=self.name, cards=[str(card) for card in self.cards_to_be_played])
+        if game.counts_cards:
+            for card in self.cards_to_be_played:
+                rank = CARD_RANK[card.code]
+                score = CARD_SCORE[card.code]
+                game.seen_ranks[rank] += 1
+                game.graveyard_ranks[rank] += 1
+                game.graveyard_score += score
+                if self.known_ranks[rank]:
+                    self.known_ranks[rank] -= 1
+                    self.known_cards -= 1
+                    self.known_score -= score
+                    game.known_ranks[rank] -= 1
+                    game.known_cards -= 1
+                    game.known_score -= score
         game.graveyard.extend(self.cards_to_be_played)
         self.cards_to_be_played.clear()
 
@@ -120,10 +212,11 @@ class Player:
         for card in cards_to_play:
             if card in self.hand:
                 self.hand.remove(card)
+                self.rank_buckets[CARD_RANK[card.code]].remove(card)
+                self.score -= CARD_SCORE[card.code]
                 self.cards_to_be_played.append(card)
             else:
                 raise ValueError("Card not in hand")
-        print(self.name, "played cards", [str(card) for card in cards_to_play]) if self.verbose else None
 
     def show_hand(self):
         # Display the player's current hand
@@ -159,17 +252,21 @@ class Player:
         return True
 
     def calculate_score(self):
-        total_score = 0
-        for card in self.hand:
-            # Add the card's value to the total score
-            total_score += min(card.rank.value,10)
+        # Cards count their rank, capped at 10 (see CARD_SCORE); kept up to date by draw_card / play_cards
+        return self.score
 
-            # Handle any special rules for Jokers or other special cards
-            # For example, if Jokers have a special value or rule, add that logic here
+    def rank_count(self, rank):
+        # Number of cards of the given rank value in hand
+        return len(self.rank_buckets[rank])
 
-        return total_score
+    def highest_rank(self, exclude=None):
+        # Highest rank value in hand, optionally ignoring one rank; None if there is none
+        for rank in range(NUM_RANKS - 1, -1, -1):
+            if self.rank_buckets[rank] and rank != exclude:
+                return rank
+        return None
 
     def make_a_move(self, game: Game):
-        return self.strategy.make_a_move(self, game)
+        return self.strategy.make_a_move(self, game, game.observations[self])
         
     
\ No newline at end of file
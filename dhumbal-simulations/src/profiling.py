@@ -0,0 +1,115 @@
+from collections import Counter
+import json
+import time
+
+PHASES = ('deal_cards', 'play_round', 'record_scores', 'remove_eliminated_players', 'prepare_next_round')
+
+
+class GameProfiler:
+    # Opt-in instrumentation of the Game loop: Game(players, profiler=profiler) wraps that game's phase
+    # methods, check_refill_deck and its players' make_a_move with timers and counters. Games built
+    # without a profiler are untouched, so the normal loop pays nothing.
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.phase_time = dict.fromkeys(PHASES, 0.0)
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+        self.move_time = Counter()  # by strategy class name
+        self.move_calls = Counter()
+        self.turns_per_round = Counter()  # turns a round took -> rounds
+        self.refills = 0
+        self.turn_limit_hits = 0
+        self.games = 0
+        self.game_time = 0.0
+
+    def attach(self, game):
+        clock = self.clock
+
+        def timed(name, method):
+            def wrapper():
+                start = clock()
+                try:
+                    return method()
+                finally:
+                    self.phase_time[name] += clock() - start
+                    self.phase_calls[name] += 1
+            return wrapper
+
+        for name in PHASES:
+            setattr(game, name, timed(name, getattr(game, name)))
+
+        play_round = game.play_round
+
+        def profiled_play_round():
+            play_round()
+            self.turns_per_round[game.turn] += 1
+            if game.turn > 100:
+                # The 100-turn limit stopped the game, even if the last pass ended with a Dhumbal call
+                self.turn_limit_hits += 1
+        game.play_round = profiled_play_round
+
+        check_refill_deck = game.check_refill_deck
+
+        def profiled_check_refill_deck():
+            if not game.deck.cards:
+                self.refills += 1
+            check_refill_deck()
+        game.check_refill_deck = profiled_check_refill_deck
+
+        players = list(game.players)
+        for player in players:
+            player.make_a_move = self._timed_move(player)
+
+        start_game = game.start_game
+
+        def profiled_start_game():
+            start = clock()
+            try:
+                start_game()
+            finally:
+                # Players outlive the game; drop their wrappers
+                for player in players:
+                    player.__dict__.pop('make_a_move', None)
+                self.games += 1
+                self.game_time += clock() - start
+        game.start_game = profiled_start_game
+
+    def _timed_move(self, player):
+        clock = self.clock
+        make_a_move = type(player).make_a_move.__get__(player)
+        strategy = type(player.strategy).__name__
+
+        def wrapper(game):
+            start = clock()
+            try:
+                return make_a_move(game)
+            finally:
+                self.move_time[strategy] += clock() - start
+                self.move_calls[strategy] += 1
+        return wrapper
+
+    def summary(self):
+        rounds = sum(self.turns_per_round.values())
+        return {
+            'games': self.games,
+            'rounds': rounds,
+            'games_per_second': self.games / self.game_time if self.game_time else None,
+            'phases': {name: _timing(self.phase_calls[name], self.phase_time[name]) for name in PHASES},
+            'make_a_move': {strategy: _timing(self.move_calls[strategy], self.move_time[strategy]) for strategy in self.move_calls},
+            'turns_per_round': {'mean': sum(turns * count for turns, count in self.turns_per_round.items()) / rounds if rounds else None,
+                                'max': max(self.turns_per_round, default=None),
+                                'histogram': dict(sorted(self.turns_per_round.items()))},
+            'refills': self.refills,
+            'turn_limit_hits': self.turn_limit_hits,
+        }
+
+    def to_json(self, path=None):
+        # The summary as JSON, also written to `path` if given
+        text = json.dumps(self.summary(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+
+def _timing(calls, seconds):
+    return {'calls': calls, 'total_seconds': seconds, 'mean_seconds': seconds / calls if calls else None}
@@ -0,0 +1,167 @@
+import json
+import os
+from itertools import chain
+from operator import itemgetter
+import numpy as np
+
+from cards import Result
+
+# One row per player per round; every column is a flat binary file that numpy.memmap can open
+COLUMNS = (
+    ('game', np.int64),
+    ('round', np.int16),
+    ('player', np.int16),  # index into the store's player names
+    ('points', np.int16),  # points scored in the round
+    ('cumulative', np.int16),
+    ('result', np.int8),  # Result value
+)
+FLUSH_ROWS = 1 << 16
+
+
+def columns_from_results(results, player_names):
+    # Flatten in-memory round logs (MonteCarlo.results) into the store's column layout. The game and
+    # round columns come from the lengths of the games and rounds, and each of the others is filled
+    # straight from the round logs, without building a tuple per row.
+    player_index = {name: i for i, name in enumerate(player_names)}
+    rounds = list(chain.from_iterable(results))
+    rounds_per_game = np.fromiter(map(len, results), np.int64, len(results))
+    rows_per_round = np.fromiter(map(len, rounds), np.int64, len(rounds))
+    num_rows = int(rows_per_round.sum())
+    first_round = np.cumsum(rounds_per_game) - rounds_per_game
+    round_number = np.arange(len(rounds)) - np.repeat(first_round, rounds_per_game)
+
+    players = list(chain.from_iterable(rounds))
+    index = {player: player_index[getattr(player, 'name', player)] for player in set(players)}
+    data = list(chain.from_iterable(map(dict.values, rounds)))
+    # Result members are singletons; finding them by id skips Enum's Python-level __hash__
+    outcomes = sorted(Result, key=id)
+    outcome_ids = np.array([id(outcome) for outcome in outcomes], dtype=np.uint64)
+    outcome_codes = np.array([outcome.value for outcome in outcomes], dtype=np.int8)
+    ids = np.fromiter(map(id, map(itemgetter(2), data)), np.uint64, num_rows)
+    return {
+        'game': np.repeat(np.repeat(np.arange(len(results), dtype=np.int64), rounds_per_game), rows_per_round),
+        'round': np.repeat(round_number, rows_per_round).astype(np.int16),
+        'player': np.fromiter(map(index.__getitem__, players), np.int16, num_rows),
+        'points': np.fromiter(map(itemgetter(0), data), np.int16, num_rows),
+        'cumulative': np.fromiter(map(itemgetter(1), data), np.int16, num_rows),
+        'result': outcome_codes[np.searchsorted(outcome_ids, ids)],
+    }
+
+
+class ResultStore:
+    # Columnar on-disk store for simulation round logs. A store is a directory holding one file per
+    # column plus meta.json with the player names and the number of games. Games are appended in
+    # order while a simulation runs, and read back through memory maps without loading the columns.
+    def __init__(self, path, player_names=None):
+        self.path = path
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if player_names is not None and list(player_names) != meta['players']:
+                raise ValueError(f"Store at {path} was written for players {meta['players']}")
+            self.player_names = meta['players']
+            self.num_games = meta['num_games']
+        else:
+            if player_names is None:
+                raise ValueError(f"No result store at {path}; player names are needed to create one")
+            os.makedirs(path, exist_ok=True)
+            self.player_names = list(player_names)
+            self.num_games = 0
+            self._write_meta()
+        self.player_index = {name: i for i, name in enumerate(self.player_names)}
+        self._buffer = {name: [] for name, _ in COLUMNS}
+        self._files = None
+
+    def _column_path(self, name):
+        return os.path.join(self.path, f'{name}.bin')
+
+    def _write_meta(self):
+        meta = {'players': self.player_names, 'num_games': self.num_games,
+                'columns': {name: np.dtype(dtype).str for name, dtype in COLUMNS}}
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def append_game(self, round_logs):
+        # round_logs is one Scoreboard.round_log, keyed by Player objects or player names
+        buffer = self._buffer
+        game = self.num_games
+        for round_number, round_log in enumerate(round_logs):
+            for player, (points, cumulative, outcome) in round_log.items():
+                buffer['game'].append(game)
+                buffer['round'].append(round_number)
+                buffer['player'].append(self.player_index[getattr(player, 'name', player)])
+                buffer['points'].append(points)
+                buffer['cumulative'].append(cumulative)
+                buffer['result'].append(outcome.value)
+        self.num_games += 1
+        if len(buffer['game']) >= FLUSH_ROWS:
+            self.flush()
+
+    def append_columns(self, columns, num_games):
+        # Bulk append of already columnar rows whose game ids are relative to the first new game
+        self.flush()
+        columns = dict(columns, game=np.asarray(columns['game']) + self.num_games)
+        self._write_columns(columns)
+        self.num_games += num_games
+        self._write_meta()
+
+    def flush(self):
+        if self._buffer['game']:
+            self._write_columns(self._buffer)
+            self._buffer = {name: [] for name, _ in COLUMNS}
+        self._write_meta()
+
+    def _write_columns(self, columns):
+        if self._files is None:
+            self._files = {name: open(self._column_path(name), 'ab') for name, _ in COLUMNS}
+        for name, dtype in COLUMNS:
+            np.asarray(columns[name], dtype=dtype).tofile(self._files[name])
+            self._files[name].flush()
+
+    def close(self):
+        self.flush()
+        if self._files is not None:
+            for f in self._files.values():
+                f.close()
+            self._files = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def column(self, name):
+        # Read-only memory map of a column (unflushed rows are not included)
+        dtype = dict(COLUMNS)[name]
+        path = self._column_path(name)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r')
+
+    def columns(self):
+        return {name: self.column(name) for name, _ in COLUMNS}
+
+    def game_bounds(self, start=0, stop=None):
+        # Row offsets of games start..stop; games that ended without a recorded round have no rows
+        stop = self.num_games if stop is None else min(stop, self.num_games)
+        return np.searchsorted(self.column('game'), np.arange(start, stop + 1))
+
+    def iter_games(self, start=0, stop=None, players=None):
+        # Yield games start..stop as Scoreboard.round_log lists. Keys are player names, or the matching
+        # objects from `players` (indexed like the store's player names) if given.
+        keys = self.player_names if players is None else players
+        outcomes = list(Result)
+        round_column = self.column('round')
+        player_column, points, cumulative, result = (self.column(name) for name in ('player', 'points', 'cumulative', 'result'))
+        bounds = self.game_bounds(start, stop)
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            round_logs = []
+            rounds = round_column[lo:hi].tolist()
+            rows = zip(rounds, player_column[lo:hi].tolist(), points[lo:hi].tolist(), cumulative[lo:hi].tolist(), result[lo:hi].tolist())
+            for round_number, player, round_points, total, code in rows:
+                if round_number == len(round_logs):
+                    round_logs.append({})
+                round_logs[-1][keys[player]] = (round_points, total, outcomes[code])
+            yield round_logs
@@ -2,9 +2,17 @@ from cards import Result
 
 
 class Scoreboard:
-    def __init__(self, players):
+    def __init__(self, players, elimination_score=108):
         self.scores = {player: 0 for player in players}  # Stores cumulative scores for each player
         self.round_log = []  # Stores the results of each round
+        self.elimination_score = elimination_score  # cumulative score that knocks a player out
+
+    def reset(self, players):
+        # Start over for a new game; the finished round log is handed on (results keep it), not cleared
+        self.scores.clear()
+        for player in players:
+            self.scores[player] = 0
+        self.round_log = []
 
     def record_round(self, game):
         # Update cumulative scores after each round
@@ -36,7 +44,9 @@ class Scoreboard:
                     round_log[player] = (score, self.scores[player],Result.NORMAL)
         
         self.round_log.append(round_log)
-        print("Round Log", [(player.name, score) for player, score in round_log.items()]) if game.verbose else None
+        if game.tracer.enabled:
+            game.tracer.emit('round_end', round=game.round,
+                             results={player.name: [points, cumulative, result.name] for player, (points, cumulative, result) in round_log.items()})
                 
 
 
@@ -45,14 +55,14 @@ class Scoreboard:
         return self.scores
 
     def get_eliminated_players(self):
-        # Return a list of players who have 108 points or more
-        return [player for player, score in self.scores.items() if score >= 108]
+        # Return a list of players who have reached the elimination score (108 points by default)
+        return [player for player, score in self.scores.items() if score >= self.elimination_score]
     
     def get_last_player(self):
         # Return the index of the last player in the previous round
         if len(self.round_log) == 0:
             return 0
         player_scores = {player: score_info[0] for player, score_info in self.round_log[-1].items()
-                         if self.scores[player] < 108}
+                         if self.scores[player] < self.elimination_score}
         worst_scorer = max(player_scores, key=player_scores.get)
         return worst_scorer
@@ -0,0 +1,111 @@
+from collections import Counter, OrderedDict
+import math
+
+
+def game_positions(round_logs):
+    # Final positions of one game, ranked like MonteCarlo.analyze_results: more rounds played first,
+    # then fewer cumulative points, then more points in the last round. Ties keep seating order.
+    summary = {}
+    for round_log in round_logs:
+        for player, (points, cumulative, _) in round_log.items():
+            rounds_played = summary[player][0] + 1 if player in summary else 1
+            summary[player] = (rounds_played, -cumulative, points)
+    ranking = sorted(summary, key=summary.get, reverse=True)
+    return {player: position for position, player in enumerate(ranking, start=1)}
+
+
+class RunningStats:
+    # Welford's online mean/variance; merge() combines two partial runs (Chan et al.)
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self):
+        # Population variance, matching np.var
+        return self.m2 / self.count if self.count else float('nan')
+
+    @property
+    def std_deviation(self):
+        return math.sqrt(self.variance)
+
+    def half_width(self, z):
+        # Half-width of the normal-approximation confidence interval of the mean
+        return z * self.std_deviation / math.sqrt(self.count) if self.count > 1 else float('inf')
+
+
+def proportion_half_width(successes, count, z):
+    # Half-width of the Wilson score interval for a proportion; unlike the normal approximation it
+    # does not collapse to zero when a player has never (or always) won so far
+    if count == 0:
+        return float('inf')
+    p = successes / count
+    return z * math.sqrt(p * (1 - p) / count + z * z / (4 * count * count)) / (1 + z * z / count)
+
+
+class ResultAccumulator:
+    # Constant-memory replacement for keeping every round log: folds each finished game into
+    # per-player score statistics, outcome counters and position histograms
+    def __init__(self):
+        self.games = 0
+        self.scores = {}
+        self.outcomes = {}
+        self.positions = {}
+
+    def add_game(self, round_logs):
+        self.games += 1
+        for round_log in round_logs:
+            for player, (points, _, outcome) in round_log.items():
+                if player.name not in self.scores:
+                    self.scores[player.name] = RunningStats()
+                    self.outcomes[player.name] = Counter()
+                    self.positions[player.name] = Counter()
+                self.scores[player.name].add(points)
+                self.outcomes[player.name][outcome] += 1
+        for player, position in game_positions(round_logs).items():
+            self.positions[player.name][position] += 1
+
+    def merge(self, other):
+        self.games += other.games
+        for name, stats in other.scores.items():
+            if name not in self.scores:
+                self.scores[name] = RunningStats()
+                self.outcomes[name] = Counter()
+                self.positions[name] = Counter()
+            self.scores[name].merge(stats)
+            self.outcomes[name].update(other.outcomes[name])
+            self.positions[name].update(other.positions[name])
+
+    def player_statistics(self):
+        # Same layout as MonteCarlo.player_statistics
+        statistics = {}
+        for name, stats in self.scores.items():
+            statistics[name] = {'mean_score': stats.mean, 'std_deviation': stats.std_deviation,
+                                'variance': stats.variance,
+                                'outcome_percentages': {outcome: (count / stats.count) * 100
+                                                        for outcome, count in self.outcomes[name].items()}}
+        return statistics
+
+    def position_probabilities(self):
+        # Same layout as MonteCarlo.player_position_probabilities
+        position_probabilities = {}
+        for name, position_counts in self.positions.items():
+            total_games = sum(position_counts.values())
+            position_probabilities[name] = {position: count / total_games for position, count in sorted(position_counts.items())}
+        return OrderedDict(sorted(position_probabilities.items()))
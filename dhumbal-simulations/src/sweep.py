@@ -0,0 +1,229 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import itertools
+import json
+import os
+import math
+from statistics import NormalDist
+
+from game import GAME_OPTIONS
+from montecarlo import MonteCarlo
+from player import Player, CardCountingStrategy, DiscardBiggestStrategy, MinimizeCardNumberStrategy
+
+# Strategies a table spec can name
+STRATEGIES = {strategy.__name__: strategy for strategy in (DiscardBiggestStrategy, MinimizeCardNumberStrategy, CardCountingStrategy)}
+# Part of every cache key; bump it whenever the games a seed produces or the cached statistics change,
+# so older cache files are no longer picked up. 2: games are dealt without a second shuffle at the start.
+CACHE_VERSION = 2
+
+
+def parameter_grid(grid):
+    # {'dhumbal_threshold': [3, 4], ...} -> [{'dhumbal_threshold': 3, ...}, ...], last parameter varying fastest
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def make_players(table):
+    # A table spec is a list of (player name, strategy class name, strategy parameters)
+    return [Player(name, STRATEGIES[strategy](**params)) for name, strategy, params in table]
+
+
+def config_key(table, num_games, seed, game_options=None):
+    # Cache key of one configuration: the whole table, game count, seed and game options (with the
+    # defaults filled in, so leaving an option out and passing its default give the same key)
+    blob = json.dumps({'version': CACHE_VERSION, 'table': [list(seat) for seat in table], 'num_games': num_games, 'seed': seed,
+                       'game_options': dict(GAME_OPTIONS, **(game_options or {}))}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def evaluate(table, num_games, seed, game_options=None):
+    # Play one configuration and return its aggregated statistics in a JSON-friendly layout:
+    # {'num_games', 'seed', 'players': {name: {'mean_score', 'std_deviation', 'variance',
+    #  'outcome_percentages': {Result name: %}, 'position_probabilities': {position: probability}}}}
+    # game_options: MonteCarlo's table rules (see game.GAME_OPTIONS)
+    mc = MonteCarlo(make_players(table), num_games, stream=True, **(game_options or {}))
+    if mc.vectorizable():
+        mc.run_batch_simulation(seed=seed)
+    else:
+        mc.run_simulation(seed=seed)
+    mc.analyze_results()
+    position_probabilities = mc.player_position_probabilities()
+    players = {}
+    for name, statistics in mc.player_statistics.items():
+        players[name] = {'mean_score': statistics['mean_score'], 'std_deviation': statistics['std_deviation'],
+                         'variance': statistics['variance'],
+                         'outcome_percentages': {outcome.name: percentage for outcome, percentage in statistics['outcome_percentages'].items()},
+                         'position_probabilities': dict(position_probabilities[name])}
+    return {'num_games': num_games, 'seed': seed, 'players': players}
+
+
+class StrategySweep:
+    # Evaluates one seat of a table over a grid of strategy parameters, e.g.
+    #   StrategySweep(table, 'Player 1', {'dhumbal_threshold': [3, 4, 5], 'draw_graveyard_threshold': [4, 5, 6]})
+    # The candidate keeps its table entry's strategy; grid values override its parameters.
+    # Each configuration's statistics are cached as <cache_dir>/<config_key>.json, so reruns and
+    # extended grids only simulate the configurations that are new. game_options are MonteCarlo's
+    # table rules, the same for every configuration.
+    def __init__(self, table, candidate, grid, num_games=10000, seed=0, cache_dir='sweep_cache', workers=None, game_options=None):
+        self.table = [tuple(seat) for seat in table]
+        self.game_options = dict(game_options or {})
+        self.candidate = candidate
+        self.grid = grid
+        self.num_games = num_games
+        self.seed = seed
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.results = []
+        self.simulated = 0  # configurations simulated (not cached) by the last run()
+
+    def configurations(self):
+        # (grid cell, table spec) pairs in grid order
+        seat = next(i for i, (name, _, _) in enumerate(self.table) if name == self.candidate)
+        name, strategy, params = self.table[seat]
+        configurations = []
+        for cell in parameter_grid(self.grid):
+            table = list(self.table)
+            table[seat] = (name, strategy, dict(params, **cell))
+            configurations.append((cell, table))
+        return configurations
+
+    def _cache_path(self, table, num_games, seed):
+        return os.path.join(self.cache_dir, config_key(table, num_games, seed, self.game_options) + '.json')
+
+    def load(self, table, num_games, seed):
+        path = self._cache_path(table, num_games, seed)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            stats = json.load(f)
+        # JSON object keys are strings; positions are ints everywhere else
+        for player in stats['players'].values():
+            player['position_probabilities'] = {int(position): p for position, p in player['position_probabilities'].items()}
+        return stats
+
+    def save(self, table, stats):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(table, stats['num_games'], stats['seed'])
+        with open(path + '.tmp', 'w') as f:
+            json.dump(stats, f)
+        os.replace(path + '.tmp', path)
+
+    def run(self):
+        # Returns [(grid cell, statistics)] in grid order, simulating uncached cells across `workers` processes
+        configurations = self.configurations()
+        stats = self.evaluate_tables([table for _, table in configurations], self.num_games, self.seed)
+        self.results = [(cell, cell_stats) for (cell, _), cell_stats in zip(configurations, stats)]
+        return self.results
+
+    def evaluate_tables(self, tables, num_games, seed):
+        # Statistics of every table spec, from the cache where possible
+        stats = [self.load(table, num_games, seed) for table in tables]
+        missing = [i for i, cached in enumerate(stats) if cached is None]
+        missing_tables = [tables[i] for i in missing]
+        if self.workers is not None and self.workers > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                evaluated = executor.map(evaluate, missing_tables, [num_games] * len(missing), [seed] * len(missing),
+                                         [self.game_options] * len(missing))
+                self._store(missing, missing_tables, evaluated, stats)
+        else:
+            self._store(missing, missing_tables, (evaluate(table, num_games, seed, self.game_options) for table in missing_tables), stats)
+        self.simulated = len(missing)
+        return stats
+
+    def _store(self, missing, tables, evaluated, stats):
+        for n, (i, table, cell_stats) in enumerate(zip(missing, tables, evaluated)):
+            self.save(table, cell_stats)
+            stats[i] = self.load(table, cell_stats['num_games'], cell_stats['seed'])
+            print(f'Completed configuration: {n + 1} / {len(missing)}', end='\r')
+
+    def ranking(self, position=1):
+        # Grid cells by the candidate's probability of finishing at `position`, best first
+        return sorted(((cell, stats['players'][self.candidate]['position_probabilities'].get(position, 0.0))
+                       for cell, stats in self.results), key=lambda result: result[1], reverse=True)
+
+
+class StrategyRace(StrategySweep):
+    # Successive halving over the same grid: every configuration plays min_games, then the best 1/eta by
+    # the candidate's mean finishing position play on until they have eta times as many, and so on until
+    # one configuration is left or the next rung would exceed max_games per configuration. A
+    # configuration outside the best 1/eta also plays on unless it is clearly inferior: the lower end of
+    # its `confidence` interval for the mean position is above the upper end of the leader's. max_games
+    # defaults to what plain successive halving would reach, min_games * eta ** ceil(log_eta(configurations)).
+    # Each rung is a new cached chunk of games (seed [seed, rung]), so rungs extend earlier ones.
+    def __init__(self, table, candidate, grid, min_games=500, eta=3, max_games=None, confidence=0.95, seed=0, cache_dir='sweep_cache',
+                 workers=None, game_options=None):
+        super().__init__(table, candidate, grid, num_games=min_games, seed=seed, cache_dir=cache_dir, workers=workers,
+                         game_options=game_options)
+        if max_games is not None and max_games < min_games:
+            raise ValueError(f"max_games ({max_games}) is below min_games ({min_games})")
+        self.min_games = min_games
+        self.eta = eta
+        self.max_games = max_games
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.history = []  # per rung: [(grid cell, games, mean position, standard error)], best first
+        self.games_played = 0
+
+    def run(self):
+        # Returns the last rung's [(grid cell, summary)] best first; summary has games, mean_position,
+        # standard_error and win_probability of the candidate
+        configurations = self.configurations()
+        totals = {i: [0, 0.0, 0.0, 0.0] for i in range(len(configurations))}  # games, sum, sum of squares, wins
+        survivors = list(totals)
+        self.history = []
+        self.games_played = 0
+        played, rung = 0, 0
+        max_games = self.max_games
+        if max_games is None:
+            rungs = 0
+            while self.eta ** rungs < len(configurations):
+                rungs += 1
+            max_games = self.min_games * self.eta ** rungs
+        while True:
+            target = self.min_games * self.eta ** rung
+            if target > max_games:
+                break
+            stats = self.evaluate_tables([configurations[i][1] for i in survivors], target - played, [self.seed, rung])
+            for i, cell_stats in zip(survivors, stats):
+                probabilities = cell_stats['players'][self.candidate]['position_probabilities']
+                n = cell_stats['num_games']
+                total = totals[i]
+                total[0] += n
+                total[1] += n * sum(position * p for position, p in probabilities.items())
+                total[2] += n * sum(position * position * p for position, p in probabilities.items())
+                total[3] += n * probabilities.get(1, 0.0)
+                self.games_played += n
+            played = target
+            ranked = sorted(survivors, key=lambda i: totals[i][1] / totals[i][0])
+            self.history.append([(configurations[i][0],) + self._summary(totals[i])[:3] for i in ranked])
+            print(f'Rung {rung}: {len(survivors)} configurations at {played} games', end='\r')
+            survivors = self._survivors(ranked, totals)
+            rung += 1
+            if len(survivors) == 1:
+                break
+
+        keys = ('games', 'mean_position', 'standard_error', 'win_probability')
+        self.results = [(configurations[i][0], dict(zip(keys, self._summary(totals[i])))) for i in ranked]
+        return self.results
+
+    def _survivors(self, ranked, totals):
+        # The best 1/eta, and every other configuration whose interval reaches the leader's
+        best = max(1, math.ceil(len(ranked) / self.eta))
+        _, leader_mean, leader_error, _ = self._summary(totals[ranked[0]])
+        bound = leader_mean + self.z * leader_error
+        survivors = ranked[:best]
+        for i in ranked[best:]:
+            _, mean, error, _ = self._summary(totals[i])
+            if mean - self.z * error <= bound:
+                survivors.append(i)
+        return survivors
+
+    @staticmethod
+    def _summary(total):
+        games, position_sum, square_sum, wins = total
+        mean = position_sum / games
+        variance = max(square_sum / games - mean * mean, 0.0)
+        return games, mean, math.sqrt(variance / games), wins / games
+
+    def ranking(self):
+        # Final rung's cells by the candidate's mean finishing position, best first
+        return [(cell, summary['mean_position']) for cell, summary in self.results]
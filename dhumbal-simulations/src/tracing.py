@@ -0,0 +1,75 @@
+from collections import deque
+import json
+
+# Events a Game emits, with their fields:
+#   game_start  players (seating order), starting_player
+#   deal        round, hands {name: [card, ...]}, graveyard (top card)
+#   draw        player, source ('deck' or 'graveyard'), card
+#   play        player, cards (what lands on the graveyard)
+#   refill      cards (new deck size)
+#   dhumbal     player, score
+#   turn_limit  turn
+#   round_end   round, results {name: [points, cumulative, Result name]}
+#   game_end    scores {name: cumulative}
+# Cards are rendered with str(card). Call sites check `tracer.enabled` before building any fields,
+# so a game traced to the null sink does no extra work.
+
+
+class NullSink:
+    enabled = False
+
+    def emit(self, event, **fields):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_SINK = NullSink()
+
+
+class RingBufferSink:
+    # Keeps the last `capacity` events in memory, as dicts with an 'event' key
+    enabled = True
+
+    def __init__(self, capacity=100000):
+        self.events = deque(maxlen=capacity)
+
+    def emit(self, event, **fields):
+        fields['event'] = event
+        self.events.append(fields)
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    # Appends one JSON object per event to a file
+    enabled = True
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def emit(self, event, **fields):
+        fields['event'] = event
+        self.file.write(json.dumps(fields) + '\n')
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PrintSink:
+    # Human-readable output, what Game(verbose=True) prints
+    enabled = True
+
+    def emit(self, event, **fields):
+        print(event, ' '.join(f'{name}={value}' for name, value in fields.items()))
+
+    def close(self):
+        pass
@@ -1,3 +1,4 @@
+from concurrent.futures import ProcessPoolExecutor
 import seaborn as sns
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -7,11 +8,19 @@ import numpy as np
 
 from trueskill import setup, Rating, rate, TrueSkill
 
+from batch_trueskill import BatchTrueSkill, game_outcome_steps, progression_lists, round_outcome_steps
+
+# Below this many windows a BatchTrueSkill step costs more than rating each window in turn: each step
+# has a fixed NumPy overhead of about ten trueskill.rate calls, which needs that many windows to share it
+MIN_BATCHED_WINDOWS = 16
+
 class TrueskillDhumbal:
     def __init__(self, mc, players, mu=1200, sigma=300, beta=4000, tau=1, draw_probability=0, sigma_ratio = 0.75):
         
         # Initialize TrueSkill environment
-        TrueSkill(mu=mu, sigma=sigma, beta=beta, tau=tau, draw_probability=draw_probability).make_as_global()
+        self.env_args = dict(mu=mu, sigma=sigma, beta=beta, tau=tau, draw_probability=draw_probability)
+        self.env = TrueSkill(**self.env_args)
+        self.env.make_as_global()
         self.sigma_ratio = 0.75
         
         # Initialize player stats
@@ -27,62 +36,101 @@ class TrueskillDhumbal:
         self.ranking_progression = {player.name: [] for player in self.players}
         
         
-    def run_simulation(self, window, batches, function):
+    def run_simulation(self, window, batches, outcome='round', workers=None):
+        # outcome is 'round' (ratings_round_outcome) or 'game' (ratings_game_outcome); the bound methods
+        # themselves are accepted too. With workers, the windows are replayed by a process pool from
+        # plain (name, rank) steps and come back in batch order.
         
         assert(batches * window <= self.mc.num_simulations)
+        outcome = self._outcome(outcome)
         
         self.ranking_progression_windows = []
-        
-        for i in range(batches):
-            print(f'Current batch: {i} / {batches}', end='\r')
-            window_run = function(window, start_index=i*window)
-            self.ranking_progression_windows.append(window_run)
-    
-    def ratings_game_outcome(self, number_of_games, start_index=0):
-        
-        self.reset_ratings()
-        
-        for i in range(number_of_games):
-            # Create game results based on player positions
-            game_results = [(player.name, self.player_stats[player.name]['positions'][start_index+i]) for player in self.players]
-            sorted_results = sorted(game_results, key=lambda x: x[1])
 
-            # Extract ratings for the rate function
-            rated_players = [(self.player_stats[name]['trueskill_rating'],) for name, _ in sorted_results]
+        if workers is None:
+            function = self.ratings_round_outcome if outcome == 'round' else self.ratings_game_outcome
+            for i in range(batches):
+                print(f'Current batch: {i} / {batches}', end='\r')
+                window_run = function(window, start_index=i*window)
+                self.ranking_progression_windows.append(window_run)
+            return
 
-            # Update ratings
-            new_ratings = rate(rated_players, ranks=[rank for _, rank in sorted_results])
+        window_steps = self.round_outcome_steps if outcome == 'round' else self.game_outcome_steps
+        steps = [window_steps(window, start_index=i*window) for i in range(batches)]
+        names = [player.name for player in self.players]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            window_runs = executor.map(replay_window, [self.env_args] * batches, [names] * batches, steps)
+            for i, window_run in enumerate(window_runs):
+                print(f'Completed batch: {i + 1} / {batches}', end='\r')
+                self.ranking_progression_windows.append(window_run)
+        if self.ranking_progression_windows:
+            self._set_ratings(self.ranking_progression_windows[-1])
 
-            # Unpack new ratings and update player_stats
-            for ((name, _), (new_rating,)) in zip(sorted_results, new_ratings):
-                self.player_stats[name]['trueskill_rating'] = new_rating
-                self.ranking_progression[name].append((new_rating.mu, new_rating.sigma))
-                
+    def run_batched_simulation(self, window, batches, outcome='round'):
+        # run_simulation with every window replayed side by side by BatchTrueSkill; outcome is 'round'
+        # (ratings_round_outcome) or 'game' (ratings_game_outcome). The (batches, steps, players, 2) ratings
+        # are kept in self.progression_array, indexed like self.progression_players. With fewer than
+        # MIN_BATCHED_WINDOWS windows they are rated one after another instead, into the same array.
+
+        assert(batches * window <= self.mc.num_simulations)
+
+        names, columns = self.mc.result_columns()
+        if self._outcome(outcome) == 'round':
+            players, ranks = round_outcome_steps(columns, window, batches)
+        else:
+            players, ranks = game_outcome_steps(columns, len(names), window, batches)
+
+        if batches >= MIN_BATCHED_WINDOWS:
+            env = self.env
+            engine = BatchTrueSkill(env.mu, env.sigma, env.beta, env.tau, env.draw_probability)
+            self.progression_array = engine.replay(players, ranks, len(names))
+        else:
+            self.progression_array = replay_windows(self.env_args, players, ranks, names)
+        self.progression_players = names
+        self.ranking_progression_windows = [{player.name: window_run[player.name] for player in self.players}
+                                            for window_run in progression_lists(self.progression_array, players, names)]
+
+        # Leave the last window's ratings in place, as run_simulation does
+        if self.ranking_progression_windows:
+            self._set_ratings(self.ranking_progression_windows[-1])
+        return self.ranking_progression_windows
+
+    def _outcome(self, outcome):
+        if outcome == self.ratings_round_outcome:
+            return 'round'
+        if outcome == self.ratings_game_outcome:
+            return 'game'
+        if outcome not in ('round', 'game'):
+            raise ValueError(f"Unknown outcome {outcome!r}, expected 'round' or 'game'")
+        return outcome
+
+    def game_outcome_steps(self, number_of_games, start_index=0):
+        # One step per game: every player with their final position
+        return [[(player.name, self.player_stats[player.name]['positions'][start_index+i]) for player in self.players]
+                for i in range(number_of_games)]
+
+    def round_outcome_steps(self, number_of_games, start_index=0):
+        # One step per round: the players of the round with the points they scored, lowest is better
+        return [[(player.name, round[player][0]) for player in round]
+                for game in self.mc.iter_results(start_index, start_index + number_of_games)
+                for round in game]
+
+    def ratings_game_outcome(self, number_of_games, start_index=0):
+        self._set_ratings(replay_window(self.env_args, [player.name for player in self.players],
+                                        self.game_outcome_steps(number_of_games, start_index)))
         return self.ranking_progression
                 
     def ratings_round_outcome(self, number_of_games, start_index=0):
-        
-        self.reset_ratings()
-        
-        for i, game in enumerate(self.mc.results[start_index:start_index + number_of_games]):
-            for round in game:
-                # Create game results based on player scores in this round
-                game_results = [(player, round[player][0]) for player in round]
-                sorted_results = sorted(game_results, key=lambda x: x[1])  # Sort based on scores, lowest is better
-
-                # Extract ratings for the rate function
-                rated_players = [(self.player_stats[player.name]['trueskill_rating'],) for player, _ in sorted_results]
-
-                # Update ratings
-                new_ratings = rate(rated_players, ranks=[rank for _, rank in sorted_results])
-
-                # Unpack new ratings and update player_stats and ranking_progression
-                for ((player, _), (new_rating,)) in zip(sorted_results, new_ratings):
-                    player_name = player.name
-                    self.player_stats[player_name]['trueskill_rating'] = new_rating
-                    self.ranking_progression[player_name].append((new_rating.mu, new_rating.sigma))
-                    
+        self._set_ratings(replay_window(self.env_args, [player.name for player in self.players],
+                                        self.round_outcome_steps(number_of_games, start_index)))
         return self.ranking_progression
+
+    def _set_ratings(self, ranking_progression):
+        # Current ratings are the last ones of a window replay
+        self.reset_ratings()
+        self.ranking_progression = ranking_progression
+        for name, ratings in ranking_progression.items():
+            if ratings:
+                self.player_stats[name]['trueskill_rating'] = Rating(*ratings[-1])
     
     def plot_ratings_windows(self, plot_score=False):
         # Initialize dictionary to store data for each player at each step
@@ -216,6 +264,40 @@ class TrueskillDhumbal:
 
 
 
+def replay_window(env_args, names, steps):
+    # Rate one window from scratch: steps are lists of (player name, rank) pairs, lower rank is better.
+    # Works only on its arguments, so windows can be replayed in separate processes.
+    env = TrueSkill(**env_args)
+    ratings = {name: env.create_rating() for name in names}
+    ranking_progression = {name: [] for name in names}
+    for step in steps:
+        sorted_results = sorted(step, key=lambda x: x[1])
+        new_ratings = env.rate([(ratings[name],) for name, _ in sorted_results], ranks=[rank for _, rank in sorted_results])
+        for ((name, _), (new_rating,)) in zip(sorted_results, new_ratings):
+            ratings[name] = new_rating
+            ranking_progression[name].append((new_rating.mu, new_rating.sigma))
+    return ranking_progression
+
+
+def replay_windows(env_args, players, ranks, names):
+    # BatchTrueSkill.replay's (sequences, steps, players, 2) progression from the same (sequences, steps,
+    # slots) inputs, with every sequence rated in turn by replay_window
+    sequences, steps, _ = players.shape
+    progression = np.empty((sequences, steps, len(names), 2))
+    start = TrueSkill(**env_args).create_rating()
+    for sequence in range(sequences):
+        valid = players[sequence] >= 0
+        window_steps = [list(zip([names[player] for player in players[sequence, step, valid[step]].tolist()],
+                                 ranks[sequence, step, valid[step]].tolist()))
+                        for step in range(steps) if valid[step].any()]
+        ratings = replay_window(env_args, names, window_steps)
+        for index, name in enumerate(names):
+            # A player keeps their rating through the steps they sit out
+            history = np.array([(start.mu, start.sigma)] + ratings[name])
+            progression[sequence, :, index] = history[np.cumsum((players[sequence] == index).any(axis=1))]
+    return progression
+
+
 # Example usage:
 # Assuming players is a list of player objects with 'name' and 'positions' attributes
 # trueskill_dhumbal = TrueskillDhumbal(players)
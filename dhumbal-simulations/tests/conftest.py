@@ -0,0 +1,17 @@
+import os
+import sys
+
+# The modules in src/ import each other by bare name (e.g. `from game import Game`)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from player import Player, DiscardBiggestStrategy, MinimizeCardNumberStrategy
+
+
+def make_players():
+    # The three-player table most engine tests play: one DiscardBiggestStrategy and two
+    # MinimizeCardNumberStrategy players with different thresholds
+    return [
+        Player('Player 1', DiscardBiggestStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5)),
+        Player('Player 2', MinimizeCardNumberStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5, try_to_pool_threshold=2)),
+        Player('Player 3', MinimizeCardNumberStrategy(dhumbal_threshold=4, draw_graveyard_threshold=4, try_to_pool_threshold=3)),
+    ]
@@ -0,0 +1,96 @@
+import unittest
+import numpy as np
+from batch_game import BatchGame
+from cards import Card, Suit, Value
+from game import Game
+from player import Player, DiscardBiggestStrategy, MinimizeCardNumberStrategy
+from scoreboard import Scoreboard
+
+
+class RecordingBatchGame(BatchGame):
+    # Keeps every deck the engine shuffles so the object engine can be dealt the same cards
+    def run(self):
+        self.decks = [[] for _ in range(self.num_games)]
+        return super().run()
+
+    def _new_decks(self, games):
+        decks = super()._new_decks(games)
+        for game, deck in zip(games, decks):
+            self.decks[game].append(deck.tolist())
+        return decks
+
+
+class ScriptedGame(Game):
+    # Game with a fixed seating, starting player and sequence of decks
+    def __init__(self, players, starting_player, shuffled_decks, **rules):
+        super().__init__(list(players), **rules)
+        self.players = list(players)
+        self.current_player = starting_player
+        self.scoreboard = Scoreboard(self.players, self.scoreboard.elimination_score)
+        self.shuffled_decks = iter(shuffled_decks)
+
+    def deal_cards(self):
+        self.deck.cards = [Card(Value(rank), Suit.NONE if rank == 0 else Suit.SPADES) for rank in next(self.shuffled_decks)]
+        super().deal_cards()
+
+
+class TestBatchGame(unittest.TestCase):
+    def setUp(self):
+        self.players = [
+            Player('Player 1', DiscardBiggestStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5)),
+            Player('Player 2', MinimizeCardNumberStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5, try_to_pool_threshold=2)),
+            Player('Player 3', MinimizeCardNumberStrategy(dhumbal_threshold=2, draw_graveyard_threshold=8, try_to_pool_threshold=8)),
+            Player('Player 4', DiscardBiggestStrategy(dhumbal_threshold=3, draw_graveyard_threshold=4)),
+        ]
+
+    def test_matches_object_engine(self):
+        batch = RecordingBatchGame(self.players, 200, seed=3)
+        results = batch.run()
+        for g, round_logs in enumerate(results):
+            seating = [self.players[p] for p in batch.seat_player[g]]
+            game = ScriptedGame(seating, seating[batch.starting_seat[g]], batch.decks[g])
+            game.start_game()
+            self.assertEqual(game.scoreboard.round_log, round_logs)
+
+    def test_table_rules(self):
+        # Larger tables: 10 players dealt 4 cards each from two decks with one joker, out at 80 points
+        players = [Player(f'Player {i + 5}', DiscardBiggestStrategy(dhumbal_threshold=4, draw_graveyard_threshold=5)) for i in range(6)]
+        rules = {'hand_size': 4, 'decks': 2, 'jokers': 1, 'elimination_score': 80}
+        batch = RecordingBatchGame(self.players + players, 30, seed=7, **rules)
+        results = batch.run()
+        for g, round_logs in enumerate(results):
+            seating = [batch.players[p] for p in batch.seat_player[g]]
+            game = ScriptedGame(seating, seating[batch.starting_seat[g]], batch.decks[g], **rules)
+            game.start_game()
+            self.assertEqual(game.scoreboard.round_log, round_logs)
+        with self.assertRaises(ValueError):
+            BatchGame(self.players * 3, 1)
+
+    def test_seed_reproducible(self):
+        first = BatchGame(self.players, 50, seed=11).run()
+        second = BatchGame(self.players, 50, seed=11).run()
+        self.assertEqual(first, second)
+
+    def test_shuffle_refills(self):
+        batch = BatchGame(self.players, 3, seed=5, reshuffle_refills=True)
+        batch.deck = np.tile(np.arange(50, dtype=np.int8), (3, 1))
+        batch.deck_size = np.array([10, 30, 1])
+        batch._shuffle_refills(np.array([0, 1, 2]))
+        # Only the recycled cards move
+        for game, size in enumerate(batch.deck_size):
+            self.assertEqual(sorted(batch.deck[game, :size]), list(range(size)))
+            self.assertEqual(list(batch.deck[game, size:]), list(range(size, 50)))
+        self.assertNotEqual(list(batch.deck[1, :30]), list(range(30)))
+        # Reshuffled refills still play complete games
+        self.assertEqual(len(BatchGame(self.players, 50, seed=5, reshuffle_refills=True).run()), 50)
+
+    def test_unsupported_strategy(self):
+        class OtherStrategy(DiscardBiggestStrategy.__mro__[1]):
+            def make_a_move(self, player, game, observation):
+                return True
+        with self.assertRaises(TypeError):
+            BatchGame([Player('Other', OtherStrategy())], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
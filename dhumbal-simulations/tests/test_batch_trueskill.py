@@ -0,0 +1,79 @@
+import unittest
+import numpy as np
+import trueskill
+
+from batch_trueskill import BatchTrueSkill, round_outcome_steps
+from conftest import make_players
+from montecarlo import MonteCarlo
+from player import Player, DiscardBiggestStrategy
+from trueskill_dhumbal import MIN_BATCHED_WINDOWS, TrueskillDhumbal, replay_windows
+
+
+class TestBatchTrueSkill(unittest.TestCase):
+    def assert_close_progressions(self, batched, reference):
+        self.assertEqual(len(batched), len(reference))
+        for batched_window, reference_window in zip(batched, reference):
+            self.assertEqual(list(batched_window), list(reference_window))
+            for name, ratings in reference_window.items():
+                self.assertEqual(len(batched_window[name]), len(ratings))
+                np.testing.assert_allclose(batched_window[name], ratings, rtol=1e-9)
+
+    def test_rate_matches_trueskill(self):
+        env = trueskill.TrueSkill()
+        engine = BatchTrueSkill()
+        rng = np.random.default_rng(3)
+        mu = rng.normal(25, 5, (300, 6))
+        sigma = rng.uniform(1, 9, (300, 6))
+        ranks = rng.integers(0, 4, (300, 6)).astype(float)  # plenty of draws
+        valid = rng.random((300, 6)) < 0.8
+        new_mu, new_sigma = engine.rate(mu, sigma, ranks, valid)
+
+        for b in range(300):
+            slots = np.flatnonzero(valid[b])
+            if len(slots) < 2:
+                np.testing.assert_array_equal(new_mu[b], mu[b])
+                continue
+            rated = env.rate([(env.create_rating(mu[b, i], sigma[b, i]),) for i in slots], ranks=ranks[b, slots].tolist())
+            np.testing.assert_allclose(new_mu[b, slots], [r.mu for (r,) in rated], rtol=1e-9)
+            np.testing.assert_allclose(new_sigma[b, slots], [r.sigma for (r,) in rated], rtol=1e-9)
+            np.testing.assert_array_equal(new_mu[b, ~valid[b]], mu[b, ~valid[b]])
+
+    def test_windows_match_run_simulation(self):
+        players = make_players() + [Player('Player 4', DiscardBiggestStrategy(dhumbal_threshold=3, draw_graveyard_threshold=6))]
+        mc = MonteCarlo(players, 60)
+        mc.run_batch_simulation(seed=2)
+        mc.analyze_results()
+        ts = TrueskillDhumbal(mc, players)
+
+        # Five windows are rated one after another, sixteen side by side
+        for window, batches in ((10, 5), (3, MIN_BATCHED_WINDOWS)):
+            for outcome, function in (('round', ts.ratings_round_outcome), ('game', ts.ratings_game_outcome)):
+                ts.run_simulation(window, batches, function)
+                reference = [{name: list(ratings) for name, ratings in progression.items()} for progression in ts.ranking_progression_windows]
+                batched = ts.run_batched_simulation(window, batches, outcome)
+                self.assert_close_progressions(batched, reference)
+                self.assertEqual(ts.progression_array.shape[0], batches)
+
+        # Process pool windows come back in batch order, identical to the serial replay
+        ts.run_simulation(3, MIN_BATCHED_WINDOWS, 'game', workers=2)
+        self.assertEqual(ts.ranking_progression_windows, reference)
+
+        # Anything but an outcome name or one of the two rating methods is rejected up front
+        for outcome in ('rounds', lambda window, start_index=0: None):
+            with self.assertRaises(ValueError):
+                ts.run_simulation(10, 5, outcome, workers=2)
+
+    def test_serial_fallback_fills_the_same_array(self):
+        mc = MonteCarlo(make_players(), 40)
+        mc.run_batch_simulation(seed=4)
+        mc.analyze_results()
+        ts = TrueskillDhumbal(mc, mc.players)
+        names, columns = mc.result_columns()
+        players, ranks = round_outcome_steps(columns, 8, 5)
+        env = ts.env
+        batched = BatchTrueSkill(env.mu, env.sigma, env.beta, env.tau, env.draw_probability).replay(players, ranks, len(names))
+        np.testing.assert_allclose(replay_windows(ts.env_args, players, ranks, names), batched, rtol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
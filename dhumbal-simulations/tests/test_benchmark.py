@@ -0,0 +1,36 @@
+import unittest
+
+from benchmark import bench_games, bench_memory, bench_scaling, compare
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_compare(self):
+        baselines = {'games/mixed/4p': {'games_per_second': 100.0}, 'analysis/store/1000': {'seconds': 0.5}}
+        results = {'games/mixed/4p': {'games_per_second': 80.0}, 'analysis/store/1000': {'seconds': 0.25},
+                   'memory/stream': {'peak_bytes_per_10k_games': 1e6}}
+        report = compare(results, baselines, tolerance=0.1)
+        # Throughput is better when higher, latency when lower; metrics without a baseline are skipped
+        self.assertEqual(set(report), {'games/mixed/4p', 'analysis/store/1000'})
+        self.assertAlmostEqual(report['games/mixed/4p']['games_per_second']['ratio'], 0.8)
+        self.assertTrue(report['games/mixed/4p']['games_per_second']['regression'])
+        self.assertAlmostEqual(report['analysis/store/1000']['seconds']['ratio'], 2.0)
+        self.assertFalse(report['analysis/store/1000']['seconds']['regression'])
+        # Descriptive metrics are reported but never compared
+        report = compare({'scaling/4p': {'games_per_second': 100.0, 'turns_per_round': 20.0}},
+                         {'scaling/4p': {'games_per_second': 100.0, 'turns_per_round': 8.0}})
+        self.assertEqual(set(report['scaling/4p']), {'games_per_second'})
+
+    def test_small_runs(self):
+        games = bench_games(player_counts=(2, 3), mixes=('mixed',), num_games=5)
+        self.assertEqual(set(games), {'games/mixed/2p', 'games/mixed/3p'})
+        self.assertTrue(all(metrics['games_per_second'] > 0 for metrics in games.values()))
+        scaling = bench_scaling(player_counts=(2, 12), num_games=5, profiled_games=5)
+        self.assertEqual(scaling['scaling/12p']['decks'], 2)
+        self.assertTrue(all(metrics['turns_per_round'] > 0 for metrics in scaling.values()))
+        memory = bench_memory(num_games=200)
+        # Keeping the round logs costs more than folding them into the accumulators
+        self.assertGreater(memory['memory/results']['peak_bytes_per_10k_games'], memory['memory/stream']['peak_bytes_per_10k_games'])
+
+
+if __name__ == '__main__':
+    unittest.main()
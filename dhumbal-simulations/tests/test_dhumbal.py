@@ -1,5 +1,8 @@
+import random
 import unittest
-from . import cards
+import cards
+from game import Game, game_rng, min_decks
+from player import Player, DiscardBiggestStrategy
 
 class TestDhumbal(unittest.TestCase):
     def setUp(self):
@@ -7,20 +10,99 @@ class TestDhumbal(unittest.TestCase):
         pass
 
     def test_card(self):
-        # Test the Card class here.
-        pass
+        for suit in cards.Suit:
+            for rank in cards.Value:
+                card = cards.Card(rank, suit)
+                self.assertEqual(cards.CARD_RANK[card.code], rank.value)
+                self.assertEqual(cards.CARD_SUIT[card.code], suit)
+                self.assertEqual(cards.CARD_SCORE[card.code], min(rank.value, 10))
 
     def test_deck(self):
-        # Test the Deck class here.
-        pass
+        deck = cards.Deck()
+        self.assertEqual(len(deck.cards), 50)
+        self.assertEqual(sum(card.rank == cards.Value.JOKER for card in deck.cards), 2)
+
+        # reset() refills the same list from the shared card pool
+        card_list = deck.cards
+        del card_list[10:]
+        deck.reset()
+        self.assertIs(deck.cards, card_list)
+        self.assertEqual(set(map(id, deck.cards)), set(map(id, cards.CARD_POOL)))
+
+        # Decks with equally seeded RNGs shuffle identically
+        self.assertEqual(cards.Deck(random.Random(4)).cards, cards.Deck(random.Random(4)).cards)
 
     def test_player(self):
-        # Test the Player class here.
-        pass
+        player = Player('Player 1', DiscardBiggestStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5))
+        game = Game([player])
+        three = cards.Card(cards.Value.THREE, cards.Suit.SPADES)
+        pile = [three, cards.Card(cards.Value.THREE, cards.Suit.CLUBS), cards.Card(cards.Value.JOKER, cards.Suit.NONE),
+                cards.Card(cards.Value.TWELVE, cards.Suit.HEARTS)]
+        for _ in range(4):
+            player.draw_card(pile, game)
+        self.assertEqual(player.calculate_score(), 16)
+        self.assertEqual(player.rank_count(3), 2)
+        self.assertEqual(player.highest_rank(), 12)
+        self.assertEqual(player.highest_rank(exclude=12), 3)
+
+        player.play_cards(player.strategy.get_cards_with_same_rank(player, three))
+        self.assertEqual(player.calculate_score(), 10)
+        self.assertEqual(player.rank_count(3), 0)
+        self.assertEqual(player.calculate_score(), sum(min(card.rank.value, 10) for card in player.hand))
+
+        player.reset_hand()
+        self.assertEqual((player.hand, player.calculate_score(), player.highest_rank()), ([], 0, None))
 
     def test_game(self):
         # Test the Game class here.
         pass
 
+    def test_game_reset(self):
+        # A reset Game plays exactly like a new one with the same rng, reusing its deck and scoreboard
+        players = [Player(f'Player {i}', DiscardBiggestStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5)) for i in range(3)]
+        reused = Game(players)
+        deck, scoreboard = reused.deck, reused.scoreboard
+        for index in range(5):
+            reused.reset(game_rng(4, index))
+            reused.start_game()
+            fresh = Game(players, rng=game_rng(4, index))
+            fresh.start_game()
+            self.assertEqual(reused.scoreboard.round_log, fresh.scoreboard.round_log)
+            self.assertEqual(reused.scoreboard.get_scores(), fresh.scoreboard.get_scores())
+        self.assertIs(reused.deck, deck)
+        self.assertIs(reused.scoreboard, scoreboard)
+
+    def test_refill(self):
+        players = [Player(f'Player {i}', DiscardBiggestStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5)) for i in range(2)]
+        for reshuffle in (False, True):
+            game = Game(players, rng=random.Random(3), reshuffle_refills=reshuffle)
+            played = list(cards.CARD_POOL[:20])
+            game.deck.cards.clear()
+            game.graveyard.extend(played)
+            game.check_refill_deck()
+            # The graveyard top stays; everything under it becomes the deck, shuffled or in play order
+            self.assertEqual(game.graveyard, played[-1:])
+            if reshuffle:
+                self.assertEqual(sorted(map(str, game.deck.cards)), sorted(map(str, played[:-1])))
+                self.assertNotEqual(game.deck.cards, played[:-1])
+            else:
+                self.assertEqual(game.deck.cards, played[:-1])
+
+    def test_table_rules(self):
+        self.assertEqual((cards.Deck(shuffle=False).total_cards, cards.Deck(shuffle=False).total_score), (50, 300))
+        deck = cards.Deck(shuffle=False, decks=3, jokers=4)
+        self.assertEqual((deck.total_cards, deck.total_score, deck.rank_counts[0], deck.rank_counts[7]), (148, 900, 4, 12))
+        self.assertEqual(min_decks(9), 1)
+        self.assertEqual(min_decks(10), 2)
+        players = [Player(f'Player {i}', DiscardBiggestStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5)) for i in range(12)]
+        with self.assertRaises(ValueError):
+            Game(players)
+        game = Game(players, rng=random.Random(1), hand_size=4, decks=2, jokers=3, elimination_score=60)
+        game.start_game()
+        self.assertEqual(game.deck.total_cards, 99)
+        # Players are eliminated at 60 points instead of 108
+        for player, score in game.scoreboard.get_scores().items():
+            self.assertEqual(player in game.players, score < 60)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
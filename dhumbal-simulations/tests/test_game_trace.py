@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+from conftest import make_players
+from game_trace import TraceReader, decode_move, decode_moves, encode_move
+from montecarlo import MonteCarlo
+from player import CALL_DHUMBAL, Player, DiscardBiggestStrategy
+from trueskill_dhumbal import TrueskillDhumbal
+
+
+class TestGameTrace(unittest.TestCase):
+    def setUp(self):
+        self.players = make_players()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'games.trace')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_move_codes(self):
+        for rank in range(13):
+            for count in range(9):
+                for from_graveyard in (False, True):
+                    code, = encode_move(rank, count, from_graveyard)
+                    self.assertLess(code, 0xFE)
+                    self.assertEqual(decode_move(code), (rank, count, from_graveyard))
+        self.assertIsNone(decode_move(0xFF))
+
+        # Bigger plays take three bytes, and decode in line with the others
+        moves = [(12, 9, True), (0, 255, False), None, (3, 2, True)]
+        data = b''.join(bytes((0xFF,)) if move is None else encode_move(*move) for move in moves)
+        self.assertEqual(len(data), 8)
+        self.assertEqual(list(decode_moves(data)), moves)
+        with self.assertRaises(ValueError):
+            encode_move(1, 256, False)
+
+    def test_replay_with_large_plays(self):
+        # 20-card hands from six decks play more cards of a rank than a one-byte code holds
+        mc = MonteCarlo(self.players, 30, trace=self.path, hand_size=20, decks=6)
+        mc.run_simulation(seed=1)
+        reader = TraceReader(self.path)
+        largest = max(move[1] for trace in reader.games() for move in trace.decoded_moves() if move is not None)
+        self.assertGreater(largest, 8)
+        self.assertEqual(list(reader.iter_games(players=self.players)), mc.results)
+
+    def test_replay_matches_recorded_games(self):
+        mc = MonteCarlo(self.players, 40, trace=self.path)
+        mc.run_simulation(seed=5)
+        self.assertTrue(all('make_a_move' not in vars(player) for player in self.players))
+
+        reader = TraceReader(self.path)
+        self.assertEqual(reader.num_games, 40)
+        self.assertEqual(reader.seed, mc.seed)
+        self.assertEqual(list(reader.iter_games(players=self.players)), mc.results)
+        self.assertEqual(len(reader.replay(reader.game(7)).scoreboard.round_log), len(mc.results[7]))
+
+    def test_replay_with_reshuffled_refills(self):
+        mc = MonteCarlo(self.players, 20, trace=self.path, reshuffle_refills=True)
+        mc.run_simulation(seed=6)
+        reader = TraceReader(self.path)
+        self.assertTrue(reader.reshuffle_refills)
+        self.assertEqual(list(reader.iter_games(players=self.players)), mc.results)
+
+    def test_replay_with_table_rules(self):
+        mc = MonteCarlo(self.players, 20, trace=self.path, hand_size=6, decks=2, jokers=0, elimination_score=150)
+        mc.run_simulation(seed=6)
+        reader = TraceReader(self.path)
+        self.assertEqual(reader.game_options, mc.game_options)
+        self.assertEqual(list(reader.iter_games(players=self.players)), mc.results)
+
+    def test_parallel_trace_matches_serial(self):
+        MonteCarlo(self.players, 12, trace=self.path).run_simulation(seed=2)
+        parallel_path = os.path.join(self.directory.name, 'parallel.trace')
+        MonteCarlo(self.players, 12, trace=parallel_path).run_simulation(seed=2, workers=2, chunksize=5)
+        with open(self.path, 'rb') as serial, open(parallel_path, 'rb') as parallel:
+            self.assertEqual(serial.read(), parallel.read())
+
+    def test_turn_limit_games(self):
+        stalling = [Player(f'Player {i}', DiscardBiggestStrategy(dhumbal_threshold=-1, draw_graveyard_threshold=0)) for i in range(3)]
+        MonteCarlo(stalling, 2, trace=self.path).run_simulation(seed=0)
+        reader = TraceReader(self.path)
+        self.assertEqual(reader.turn_limit_games(), [0, 1])
+        # 101 turns of 3 moves, without a Dhumbal call or a scored round
+        trace = reader.game(1)
+        self.assertEqual((len(trace.moves), trace.dhumbal_calls()), (303, 0))
+        self.assertEqual(reader.replay(trace).scoreboard.round_log, [])
+
+    def test_dhumbal_call_on_the_turn_limit(self):
+        class LastTurnStrategy(DiscardBiggestStrategy):
+            # Stalls until the 100th turn, then calls Dhumbal
+            def decide(self, observation):
+                return CALL_DHUMBAL if observation.turn == 100 else super().decide(observation)
+
+        players = [Player(f'Player {i}', LastTurnStrategy(dhumbal_threshold=-1, draw_graveyard_threshold=0)) for i in range(3)]
+        mc = MonteCarlo(players, 2, trace=self.path)
+        mc.run_simulation(seed=0)
+        # The called round is scored, and the limit still stops the game
+        self.assertTrue(all(len(round_logs) == 1 for round_logs in mc.results))
+        self.assertEqual(TraceReader(self.path).turn_limit_games(), [0, 1])
+
+    def test_streamed_run_rates_from_trace(self):
+        # With stream=True the round logs are not kept; the ratings are computed from the trace
+        streamed = MonteCarlo(self.players, 30, stream=True, trace=self.path)
+        streamed.run_simulation(seed=9)
+        streamed.analyze_results()
+        kept = MonteCarlo(self.players, 30)
+        kept.run_simulation(seed=9)
+        kept.analyze_results()
+        ratings = []
+        for mc in (streamed, kept):
+            trueskill = TrueskillDhumbal(mc, self.players)
+            ratings.append(trueskill.ratings_round_outcome(30))
+        self.assertEqual(ratings[0], ratings[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
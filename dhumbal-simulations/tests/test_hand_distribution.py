@@ -0,0 +1,129 @@
+import itertools
+import random
+import unittest
+from collections import Counter
+from math import comb
+
+import numpy as np
+
+from cards import CARD_RANK, CARD_SCORE, POOL_RANK_COUNTS, Deck
+from game import Game, game_rng
+from hand_distribution import HandDistribution, control_variate_estimate, expected_opponent_min_score, score_cdf_table
+from player import Player, CardCountingStrategy
+
+
+class TestHandDistribution(unittest.TestCase):
+    def test_full_deck(self):
+        tables = HandDistribution()
+        self.assertEqual(tables.total_cards, 50)
+        for k in range(6):
+            self.assertAlmostEqual(tables.score_pmf[k].sum(), 1.0)
+            self.assertEqual(sum(tables.score_counts[k]), comb(50, k))
+        # Every card is equally likely to be in the hand
+        card_mean = sum(CARD_SCORE[card.code] for card in Deck().cards) / 50
+        self.assertAlmostEqual(tables.mean_score(5), 5 * card_mean)
+        self.assertEqual(tables.prob_score_at_most(5, 50), 1.0)
+        self.assertEqual(tables.prob_score_at_most(5, -1), 0.0)
+        # Two jokers and three aces is the only way to score 3
+        self.assertEqual(tables.score_counts[5][3], comb(2, 2) * comb(4, 3))
+
+    def test_matches_enumeration(self):
+        rank_counts = (1, 2, 0, 3, 0, 0, 0, 0, 0, 0, 0, 2, 2)
+        tables = HandDistribution(rank_counts, max_cards=4)
+        cards = [rank for rank, count in enumerate(rank_counts) for _ in range(count)]
+        for k in range(5):
+            scores = Counter()
+            patterns = Counter()
+            for hand in itertools.combinations(cards, k):
+                scores[sum(min(rank, 10) for rank in hand)] += 1
+                patterns[tuple(sorted(Counter(hand).values(), reverse=True))] += 1
+            self.assertEqual({score: ways for score, ways in enumerate(tables.score_counts[k]) if ways}, dict(scores))
+            self.assertEqual(dict(tables.pattern_counts[k]), dict(patterns))
+
+    def test_matches_dealt_hands(self):
+        tables = HandDistribution()
+        rng = random.Random(7)
+        scores = []
+        pairs = 0
+        for _ in range(20000):
+            hand = rng.sample(Deck().cards, 5)
+            scores.append(sum(CARD_SCORE[card.code] for card in hand))
+            pairs += max(Counter(CARD_RANK[card.code] for card in hand).values()) >= 2
+        scores = np.array(scores)
+        self.assertAlmostEqual((scores <= 20).mean(), tables.prob_score_at_most(5, 20), delta=0.015)
+        self.assertAlmostEqual(pairs / 20000, tables.prob_group_of_at_least(5, 2), delta=0.015)
+        # Independent hands: the expected minimum of three is close to the sampled one
+        sampled_min = scores[:19998].reshape(-1, 3).min(axis=1).mean()
+        self.assertAlmostEqual(sampled_min, tables.expected_min_score(5, 3), delta=0.5)
+
+    def test_min_hand_score_matches_enumeration(self):
+        rank_counts = (1, 2, 0, 3, 0, 0, 0, 0, 0, 0, 0, 2, 2)
+        tables = HandDistribution(rank_counts, max_cards=3)
+        cards = [rank for rank, count in enumerate(rank_counts) for _ in range(count)]
+        # One opponent holds 2 unknown cards and 3 known points, another 1 unknown card
+        first = [3 + sum(min(rank, 10) for rank in hand) for hand in itertools.combinations(cards, 2)]
+        second = [min(rank, 10) for rank in cards]
+        expected = np.mean([min(a, b) for a in first for b in second])
+        self.assertAlmostEqual(tables.expected_min_hand_score([(2, 3), (1, 0)]), expected)
+        self.assertAlmostEqual(tables.expected_min_hand_score([(2, 0)] * 3), tables.expected_min_score(2, 3))
+        self.assertEqual(tables.expected_min_hand_score([(0, 7)]), 7)
+
+    def test_score_cdf_table(self):
+        # The score-only tables equal HandDistribution's, and are built once per set of counts
+        for rank_counts, max_cards in (((1, 2, 0, 3, 0, 0, 0, 0, 0, 0, 0, 2, 2), 4), (tuple(POOL_RANK_COUNTS), 5)):
+            table = score_cdf_table(rank_counts, max_cards)
+            np.testing.assert_allclose(table, HandDistribution(rank_counts, max_cards).score_cdf, rtol=1e-12)
+            self.assertIs(score_cdf_table(rank_counts, max_cards), table)
+
+        # Pools a few cards apart are reached from the last table, and stay exact
+        rng = random.Random(4)
+        rank_counts = list(POOL_RANK_COUNTS)
+        for step in range(60):
+            rank = rng.randrange(13)
+            rank_counts[rank] += 1 if rank_counts[rank] < POOL_RANK_COUNTS[rank] and rng.random() < 0.4 else -(rank_counts[rank] > 0)
+            table = score_cdf_table(tuple(rank_counts), 5)
+            if step % 15 == 0:
+                np.testing.assert_allclose(table, HandDistribution(rank_counts, 5).score_cdf, rtol=1e-12)
+
+    def test_opponent_min_score_during_a_round(self):
+        players = [Player(f'Player {i}', CardCountingStrategy(dhumbal_threshold=0)) for i in range(3)]
+        game = Game(players, rng=game_rng(5, 0))
+        game.deck.shuffle_deck()
+        game.deal_cards()
+        for _ in range(6):
+            player = game.players[game.turn % 3]
+            player.make_a_move(game)
+            game.check_refill_deck()
+            game.turn += 1
+        player = game.players[game.turn % 3]
+        observation = game.observations[player]
+        estimate = expected_opponent_min_score(observation)
+
+        # Deal the opponents' unknown cards from what this player has not seen, many times over
+        index = game.players.index(player)
+        opponents = [game.players[(index + offset) % 3] for offset in (1, 2)]
+        unseen = [rank for rank, count in enumerate(observation.unseen_counts) for _ in range(count)]
+        rng = random.Random(3)
+        minima = []
+        for _ in range(20000):
+            rng.shuffle(unseen)
+            scores, dealt = [], 0
+            for opponent in opponents:
+                unknown = len(opponent.hand) - opponent.known_cards
+                scores.append(opponent.known_score + sum(min(rank, 10) for rank in unseen[dealt:dealt + unknown]))
+                dealt += unknown
+            minima.append(min(scores))
+        # The opponents share the unseen cards; treating their hands as independent is close
+        self.assertAlmostEqual(estimate, np.mean(minima), delta=0.5)
+
+    def test_control_variate(self):
+        rng = np.random.default_rng(0)
+        controls = rng.normal(10, 3, 5000)
+        values = controls + rng.normal(0, 1, 5000)
+        estimate, standard_error = control_variate_estimate(values, controls, 10)
+        self.assertAlmostEqual(estimate, 10, delta=4 * standard_error)
+        self.assertLess(standard_error, values.std() / np.sqrt(len(values)) / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,24 +1,163 @@
 import unittest
-from src import montecarlo
+import numpy as np
+import montecarlo
+from conftest import make_players
+from player import Player, CardCountingStrategy
+from result_store import COLUMNS, columns_from_results
+
 
 class TestMonteCarlo(unittest.TestCase):
     def setUp(self):
-        # Set up logic here if needed
-        pass
+        self.players = make_players()
 
     def test_run_simulation(self):
-        # Instantiate the MonteCarlo class and run a simulation
-        # mc = montecarlo.MonteCarlo()
-        # result = mc.run_simulation()
-        # Assert something about the result
-        # self.assertEqual(result, expected_result)
+        mc = montecarlo.MonteCarlo(self.players, 20)
+        mc.run_simulation()
+        self.assertEqual(len(mc.results), 20)
+        for round_logs in mc.results:
+            for round_log in round_logs:
+                self.assertTrue(set(round_log) <= set(self.players))
+
+    def test_run_parallel_simulation(self):
+        mc = montecarlo.MonteCarlo(self.players, 30)
+        mc.run_simulation(workers=2, chunksize=7, seed=1)
+        self.assertEqual(len(mc.results), 30)
+        # Round logs come back keyed by the caller's own Player objects
+        self.assertTrue(all(set(round_log) <= set(self.players) for round_logs in mc.results for round_log in round_logs))
+
+        # Same seed gives the same games, whatever the chunking, the number of workers or their order
+        other = montecarlo.MonteCarlo(make_players(), 30)
+        other.run_simulation(workers=3, chunksize=4, seed=1)
+        as_names = lambda results: [[{p.name: data for p, data in r.items()} for r in g] for g in results]
+        self.assertEqual(as_names(mc.results), as_names(other.results))
+        serial = montecarlo.MonteCarlo(make_players(), 30)
+        serial.run_simulation(seed=1)
+        self.assertEqual(as_names(serial.results), as_names(mc.results))
+
+    def test_replay_game(self):
+        mc = montecarlo.MonteCarlo(self.players, 15)
+        mc.run_simulation()
+        for index in (0, 7, 14):
+            self.assertEqual(mc.replay_game(index).scoreboard.round_log, mc.results[index])
+        # Games leave the caller's player list alone
+        self.assertEqual(mc.players, self.players)
+
+    def test_replay_needs_the_object_engine(self):
+        mc = montecarlo.MonteCarlo(self.players, 15)
+        with self.assertRaises(ValueError):
+            mc.replay_game(0)
+        mc.run_simulation(seed=2)
+        mc.run_batch_simulation(seed=2)
+        # Batch games have no Game to rebuild, whatever ran before
+        with self.assertRaises(ValueError):
+            mc.replay_game(0)
+        mc.run_adaptive(win_half_width=0.5, batch_size=15, seed=2)
+        with self.assertRaises(ValueError):
+            mc.replay_game(0)
+
+        # An object-engine adaptive run replays, game for game
+        players = [Player('Player 0', CardCountingStrategy(dhumbal_threshold=7))] + self.players
+        mc = montecarlo.MonteCarlo(players, 30)
+        mc.run_adaptive(win_half_width=0.5, batch_size=10, seed=4)
+        self.assertEqual(mc.engine, 'game')
+        for index in (0, len(mc.results) - 1):
+            self.assertEqual(mc.replay_game(index).scoreboard.round_log, mc.results[index])
+
+        # Nor can the vectorized engine record a trace
+        with self.assertRaises(ValueError):
+            montecarlo.MonteCarlo(self.players, 15, trace='unused.trace').run_batch_simulation()
 
     def test_analyze_results(self):
-        # Test the analyze_results method
-        # You'll need to decide what to assert based on your implementation
-        pass
+        mc = montecarlo.MonteCarlo(self.players, 20)
+        mc.run_simulation()
+        mc.analyze_results()
+        self.assertEqual(set(mc.player_statistics), {player.name for player in self.players})
+        for probabilities in mc.player_position_probabilities().values():
+            self.assertAlmostEqual(sum(probabilities.values()), 1.0)
+
+    def test_streaming_matches_stored_results(self):
+        stored = montecarlo.MonteCarlo(self.players, 300)
+        stored.run_batch_simulation(batch_size=128, seed=5)
+        stored.analyze_results()
+        streamed = montecarlo.MonteCarlo(self.players, 300, stream=True)
+        streamed.run_batch_simulation(batch_size=128, seed=5)
+        streamed.analyze_results()
+
+        self.assertEqual(streamed.results, [])
+        self.assertEqual(streamed.player_position_probabilities(), stored.player_position_probabilities())
+        for name, expected in stored.player_statistics.items():
+            actual = streamed.player_statistics[name]
+            for key in ('mean_score', 'std_deviation', 'variance'):
+                self.assertAlmostEqual(actual[key], expected[key], places=9)
+            self.assertEqual(actual['outcome_percentages'].keys(), expected['outcome_percentages'].keys())
+            for outcome, percentage in expected['outcome_percentages'].items():
+                self.assertAlmostEqual(actual['outcome_percentages'][outcome], percentage, places=9)
+
+    def test_parallel_streaming(self):
+        mc = montecarlo.MonteCarlo(self.players, 40, stream=True)
+        mc.run_simulation(workers=2, chunksize=10, seed=2)
+        self.assertEqual(mc.accumulator.games, 40)
+        for probabilities in mc.player_position_probabilities().values():
+            self.assertAlmostEqual(sum(probabilities.values()), 1.0)
+
+    def test_streamed_runs_start_over(self):
+        # Each run only counts its own games, like self.results
+        once = montecarlo.MonteCarlo(self.players, 30, stream=True)
+        once.run_simulation(seed=4)
+        once.analyze_results()
+        mc = montecarlo.MonteCarlo(self.players, 30, stream=True)
+        mc.run_batch_simulation(seed=1)
+        mc.run_simulation(workers=2, chunksize=10, seed=2)
+        mc.run_simulation(seed=4)
+        self.assertEqual(mc.accumulator.games, 30)
+        mc.analyze_results()
+        self.assertEqual(mc.player_statistics, once.player_statistics)
+
+        # run_adaptive numbers its games and counts them towards max_games from zero
+        self.assertEqual(mc.run_adaptive(score_half_width=1e-6, batch_size=100, max_games=250, seed=3), 250)
+        self.assertEqual(mc.run_adaptive(score_half_width=1e-6, batch_size=100, max_games=250, seed=3), 250)
+        self.assertEqual(mc.accumulator.games, 250)
+
+    def test_vectorized_analysis_matches_loop(self):
+        loop = montecarlo.MonteCarlo(self.players, 400)
+        loop.run_batch_simulation(seed=8)
+        vectorized = montecarlo.MonteCarlo(self.players, 400)
+        vectorized.results = loop.results
+        loop.analyze_results()
+        vectorized.analyze_results(vectorized=True)
+
+        self.assertEqual(vectorized.player_statistics, loop.player_statistics)
+        self.assertEqual(vectorized.player_position_probabilities(), loop.player_position_probabilities())
+        for name, stats in loop.player_stats.items():
+            self.assertEqual(vectorized.player_stats[name]['positions'].tolist(), stats['positions'])
+            self.assertEqual(vectorized.player_stats[name]['scores'].tolist(), stats['scores'])
+
+
+    def test_batch_run_keeps_engine_columns(self):
+        mc = montecarlo.MonteCarlo(self.players, 300)
+        mc.run_batch_simulation(batch_size=128, seed=9)
+        names, columns = mc.result_columns()
+        expected = columns_from_results(mc.results, names)
+        for name, dtype in COLUMNS:
+            self.assertEqual(columns[name].dtype, dtype)
+            np.testing.assert_array_equal(columns[name], expected[name])
+        # Results from another run are flattened again
+        mc.run_simulation(seed=9)
+        self.assertEqual(len(mc.result_columns()[1]['game']), sum(len(round_log) for round_logs in mc.results for round_log in round_logs))
+
+    def test_adaptive_stops_at_targets(self):
+        mc = montecarlo.MonteCarlo(self.players, 20000)
+        games = mc.run_adaptive(win_half_width=0.05, batch_size=100, seed=3)
+        self.assertEqual(games % 100, 0)
+        self.assertLess(games, 20000)
+        self.assertEqual(len(mc.results), games)
+        self.assertTrue(all(widths['win_probability'] <= 0.05 for widths in mc.half_widths.values()))
+
+        # A target out of reach stops at max_games
+        mc = montecarlo.MonteCarlo(self.players, 20000, stream=True)
+        self.assertEqual(mc.run_adaptive(score_half_width=1e-6, batch_size=100, max_games=250, seed=3), 250)
+        self.assertEqual(mc.accumulator.games, 250)
 
-    # Add more test methods as needed
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
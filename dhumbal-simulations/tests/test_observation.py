@@ -0,0 +1,127 @@
+import unittest
+from collections import Counter
+
+from cards import CARD_RANK
+from game import Game, game_rng
+from player import CALL_DHUMBAL, Player, CardCountingStrategy, DiscardBiggestStrategy, MinimizeCardNumberStrategy
+
+
+class CheckingStrategy(DiscardBiggestStrategy):
+    # Compares every observation with the same state recomputed from the game's piles and hands
+    counts_cards = True
+
+    def __init__(self, test):
+        super().__init__(dhumbal_threshold=5, draw_graveyard_threshold=5)
+        self.test = test
+        self.moves = 0
+
+    def make_a_move(self, player, game, observation):
+        ranks = Counter(CARD_RANK[card.code] for card in player.hand)
+        self.test.assertEqual(observation.top_rank, CARD_RANK[game.graveyard[-1].code])
+        self.test.assertEqual(observation.hand_rank_counts, tuple(ranks[rank] for rank in range(13)))
+        self.test.assertEqual(observation.hand_score, sum(min(rank, 10) * count for rank, count in ranks.items()))
+        self.test.assertEqual(observation.deck_remaining, len(game.deck.cards))
+        index = game.players.index(player)
+        others = game.players[index + 1:] + game.players[:index]
+        self.test.assertEqual(observation.opponent_hand_sizes, tuple(len(other.hand) for other in others))
+        # Every graveyard card has been face up this round; cards refilled into the deck stay counted
+        graveyard = Counter(CARD_RANK[card.code] for card in game.graveyard)
+        self.test.assertTrue(all(observation.seen(rank) >= graveyard[rank] for rank in range(13)))
+        # Unseen cards are exactly those in the deck or an opponent's hand, less what opponents were seen taking
+        hidden = Counter(CARD_RANK[card.code] for card in game.deck.cards + [card for other in others for card in other.hand])
+        for other in others:
+            held = Counter(CARD_RANK[card.code] for card in other.hand)
+            self.test.assertTrue(all(other.known_ranks[rank] <= held[rank] for rank in range(13)))
+        unseen = tuple(hidden[rank] - sum(other.known_ranks[rank] for other in others) for rank in range(13))
+        self.test.assertEqual(observation.unseen_counts, unseen)
+        self.test.assertEqual(observation.unseen_cards, sum(unseen))
+        self.test.assertAlmostEqual(observation.mean_unseen_score, sum(count * min(rank, 10) for rank, count in enumerate(unseen)) / sum(unseen))
+        self.moves += 1
+        return super().make_a_move(player, game, observation)
+
+
+class FixedObservation:
+    # Just the fields CardCountingStrategy.decide reads, set by hand
+    def __init__(self, hand, top_rank, mean_unseen_score, opponent_known_totals, unseen=()):
+        self.hand = Counter(hand)
+        self.top_rank = top_rank
+        self.mean_unseen_score = mean_unseen_score
+        self.opponent_known_totals = opponent_known_totals
+        self.unseen_counts = tuple(Counter(unseen)[rank] for rank in range(13))
+        self.hand_score = sum(min(rank, 10) for rank in hand)
+
+    def rank_count(self, rank):
+        return self.hand[rank]
+
+    def highest_rank(self, exclude=None):
+        return max((rank for rank in self.hand if rank != exclude), default=None)
+
+
+class TestObservation(unittest.TestCase):
+    def test_observation_matches_game(self):
+        strategies = [CheckingStrategy(self) for _ in range(3)]
+        players = [Player(f'Player {i}', strategy) for i, strategy in enumerate(strategies)]
+        for index in range(5):
+            Game(players, rng=game_rng(1, index)).start_game()
+        self.assertGreater(sum(strategy.moves for strategy in strategies), 0)
+
+    def test_counts_are_opt_in(self):
+        class Peeking(DiscardBiggestStrategy):
+            # Reads the counts without asking Game to keep them
+            def make_a_move(self, player, game, observation):
+                observation.unseen_counts
+                return super().make_a_move(player, game, observation)
+
+        players = [Player(f'Player {i}', DiscardBiggestStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5)) for i in range(3)]
+        game = Game(players, rng=game_rng(3, 0))
+        game.start_game()
+        # Nobody counts cards, so nothing is counted
+        self.assertFalse(game.counts_cards)
+        self.assertEqual(game.seen_ranks, [0] * 13)
+        self.assertTrue(all(player.known_cards == 0 for player in players))
+
+        players[0].strategy = Peeking(dhumbal_threshold=5, draw_graveyard_threshold=5)
+        with self.assertRaises(ValueError):
+            Game(players, rng=game_rng(3, 0)).start_game()
+
+    def test_card_counting_calls_below_the_expected_lowest_opponent(self):
+        strategy = CardCountingStrategy(dhumbal_threshold=7, call_margin=2)
+        # Every unseen card is a 5, so an opponent with 2 unknown cards holds exactly 10
+        fives = [5] * 8
+        self.assertIs(strategy.decide(FixedObservation([1, 2, 3], 12, 5, [(2, 0, 0)], fives)), CALL_DHUMBAL)
+        # One seen taking a 4 holds 4 + 5: a hand of 6 calls, one of 7 is not strictly more than 2 below
+        self.assertIs(strategy.decide(FixedObservation([1, 2, 3], 12, 5, [(2, 0, 0), (2, 1, 4)], fives)), CALL_DHUMBAL)
+        self.assertEqual(strategy.decide(FixedObservation([1, 2, 4], 12, 5, [(2, 0, 0), (2, 1, 4)], fives)), (4, False))
+        # However low the opponents, a hand above dhumbal_threshold plays on
+        self.assertEqual(strategy.decide(FixedObservation([4, 4], 12, 5, [(5, 0, 0)], fives)), (4, False))
+
+        # Aces and tens: each of two opponents' one unknown card averages 5.5, but the lower of the
+        # two is an ace three times in four, so the expected lowest opponent is 3.25
+        aces_and_tens = [1] * 4 + [10] * 4
+        self.assertEqual(strategy.decide(FixedObservation([2], 12, 5.5, [(1, 0, 0), (1, 0, 0)], aces_and_tens)), (2, False))
+        self.assertIs(strategy.decide(FixedObservation([1], 12, 5.5, [(1, 0, 0), (1, 0, 0)], aces_and_tens)), CALL_DHUMBAL)
+
+    def test_card_counting_draws_a_graveyard_top_better_than_unseen(self):
+        strategy = CardCountingStrategy(dhumbal_threshold=0, draw_margin=1)
+        opponents = [(5, 0, 0)]
+        # A 3 plus the margin beats an average unseen card of 4.5, not one of 4
+        self.assertEqual(strategy.decide(FixedObservation([9, 12], 3, 4.5, opponents)), (12, True))
+        self.assertEqual(strategy.decide(FixedObservation([9, 12], 3, 4, opponents)), (12, False))
+        # Face cards count their score, not their rank: a jack (10 + 1) beats an average of 11.5
+        self.assertEqual(strategy.decide(FixedObservation([9, 12], 11, 11.5, opponents)), (12, True))
+        # A top that pairs with the hand is taken whatever the unseen cards, keeping the pair
+        self.assertEqual(strategy.decide(FixedObservation([9, 12], 9, 1, opponents)), (12, True))
+        self.assertEqual(strategy.decide(FixedObservation([9, 9, 12], 12, 1, opponents)), (9, True))
+
+    def test_card_counting_strategy(self):
+        players = [Player('Counter', CardCountingStrategy(dhumbal_threshold=7, call_margin=2, draw_margin=1)),
+                   Player('Player 1', MinimizeCardNumberStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5, try_to_pool_threshold=2)),
+                   Player('Player 2', DiscardBiggestStrategy(dhumbal_threshold=5, draw_graveyard_threshold=5))]
+        for index in range(20):
+            game = Game(players, rng=game_rng(2, index))
+            game.start_game()
+            self.assertTrue(game.scoreboard.round_log)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import numpy as np
+
+from conftest import make_players
+from paired import PairedBatchGame, PairedComparison, PairedGame
+
+
+def make_table(pool_threshold):
+    # The shared table with Player 2's pooling threshold varied
+    players = make_players()
+    players[1].strategy.try_to_pool_threshold = pool_threshold
+    return players
+
+
+class TestPaired(unittest.TestCase):
+    def test_games_do_not_depend_on_batching(self):
+        players = make_table(2)
+        whole = PairedBatchGame(players, 40, seed=5)
+        whole_logs = whole.run()
+        tail = PairedBatchGame(players, 15, seed=5, first_game=25)
+        self.assertEqual(tail.run(), whole_logs[25:])
+        np.testing.assert_array_equal(tail.seat_player, whole.seat_player[25:])
+
+    def test_same_table_has_no_difference(self):
+        summary = PairedComparison(make_table(2), make_table(2), 50).run(seed=1)
+        for stats in summary.values():
+            self.assertEqual(stats['position_difference'], 0)
+            self.assertEqual(stats['standard_error'], 0)
+
+    def test_paired_difference(self):
+        comparison = PairedComparison(make_table(2), make_table(9), 400, batch_size=150)
+        summary = comparison.run(seed=2)
+        self.assertEqual(summary['Player 2']['games'], 400)
+        # Sharing the deals makes the difference much more precise than two independent runs
+        self.assertLess(summary['Player 2']['standard_error'], summary['Player 2']['unpaired_standard_error'])
+        np.testing.assert_array_equal(PairedComparison(make_table(2), make_table(9), 400).run(seed=2)['Player 2']['position_difference'],
+                                      summary['Player 2']['position_difference'])
+
+    def test_table_rules(self):
+        rules = {'hand_size': 4, 'decks': 2, 'elimination_score': 80, 'reshuffle_refills': True}
+        players = make_table(2)
+        batch = PairedBatchGame(players, 30, seed=4, **rules)
+        self.assertEqual((batch.hand_size, batch.elimination_score, len(batch.deck_ranks)), (4, 80, 98))
+        # Refill shuffles come from the batch's own keys, so a batch replays exactly
+        self.assertEqual(batch.run(), PairedBatchGame(players, 30, seed=4, **rules).run())
+        for vectorized in (True, False):
+            comparison = PairedComparison(make_table(2), make_table(2), 20, **rules)
+            comparison.vectorized = vectorized
+            for stats in comparison.run(seed=3).values():
+                self.assertEqual(stats['position_difference'], 0)
+
+    def test_refill_shuffles_are_common(self):
+        rules = {'reshuffle_refills': True}
+        # Each game's refills are keyed on its own (seed, game, round, refill), not on the batch
+        players = make_table(2)
+        whole = PairedBatchGame(players, 40, seed=5, **rules).run()
+        self.assertEqual(PairedBatchGame(players, 15, seed=5, first_game=25, **rules).run(), whole[25:])
+
+        # In the object engine a refill no longer draws from the game's RNG, so the decks of later rounds
+        # stay common to both tables however differently they refill
+        class DeckRecordingGame(PairedGame):
+            def deal_cards(self):
+                self.decks.append([card.code for card in self.deck.cards])
+                super().deal_cards()
+
+        refills = []
+        for pool_threshold in (2, 9):
+            game = DeckRecordingGame(make_table(pool_threshold), seed=6, **rules)
+            game.decks = []
+            game.play_game(3)
+            refills.append(game.decks)
+        rounds = min(map(len, refills))
+        self.assertGreater(rounds, 1)
+        self.assertEqual(refills[0][:rounds], refills[1][:rounds])
+
+        # Two identical configurations still give no paired difference
+        for vectorized in (True, False):
+            comparison = PairedComparison(make_table(9), make_table(9), 30, batch_size=7, **rules)
+            comparison.vectorized = vectorized
+            for stats in comparison.run(seed=7).values():
+                self.assertEqual(stats['position_difference'], 0)
+
+    def test_object_engine(self):
+        comparison = PairedComparison(make_table(2), make_table(2), 20)
+        comparison.vectorized = False
+        for stats in comparison.run(seed=3).values():
+            self.assertEqual(stats['position_difference'], 0)
+            self.assertAlmostEqual(stats['mean_position_a'], stats['mean_position_b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import unittest
+
+from conftest import make_players
+from montecarlo import MonteCarlo
+from player import CALL_DHUMBAL, Player, DiscardBiggestStrategy
+from profiling import PHASES, GameProfiler
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.players = make_players()
+
+    def test_profiled_run(self):
+        profiled = MonteCarlo(self.players, 25, profiler=GameProfiler())
+        profiled.run_simulation(seed=0)
+        plain = MonteCarlo(self.players, 25)
+        plain.run_simulation(seed=0)
+        # Instrumentation does not change the games, and the players are left unwrapped
+        self.assertEqual(profiled.results, plain.results)
+        self.assertTrue(all('make_a_move' not in vars(player) for player in self.players))
+
+        summary = json.loads(profiled.profiler.to_json())
+        self.assertEqual(summary['games'], 25)
+        rounds = sum(len(round_logs) for round_logs in plain.results)
+        self.assertEqual(summary['rounds'], summary['phases']['play_round']['calls'])
+        self.assertEqual(summary['rounds'], summary['phases']['record_scores']['calls'])
+        self.assertEqual(summary['rounds'] - summary['turn_limit_hits'], rounds)
+        self.assertEqual(set(summary['phases']), set(PHASES))
+        self.assertEqual(set(summary['make_a_move']), {'DiscardBiggestStrategy', 'MinimizeCardNumberStrategy'})
+        self.assertGreater(summary['games_per_second'], 0)
+        self.assertGreater(summary['refills'], 0)
+
+    def test_turn_limit(self):
+        # Nobody ever calls Dhumbal, so every game stops at the turn limit in its first round
+        stalling = [Player(f'Player {i}', DiscardBiggestStrategy(dhumbal_threshold=-1, draw_graveyard_threshold=0)) for i in range(3)]
+        profiler = GameProfiler()
+        mc = MonteCarlo(stalling, 2, profiler=profiler)
+        mc.run_simulation(seed=1)
+        summary = profiler.summary()
+        self.assertEqual(summary['turn_limit_hits'], 2)
+        self.assertEqual(summary['turns_per_round']['histogram'], {101: 2})
+        self.assertEqual(mc.results, [[], []])
+
+        class LastTurnStrategy(DiscardBiggestStrategy):
+            # Stalls until the 100th turn, then calls Dhumbal: the round is scored, but the limit still hits
+            def decide(self, observation):
+                return CALL_DHUMBAL if observation.turn == 100 else super().decide(observation)
+
+        profiler = GameProfiler()
+        players = [Player(f'Player {i}', LastTurnStrategy(dhumbal_threshold=-1, draw_graveyard_threshold=0)) for i in range(3)]
+        mc = MonteCarlo(players, 2, profiler=profiler)
+        mc.run_simulation(seed=1)
+        self.assertEqual(profiler.summary()['turn_limit_hits'], 2)
+        self.assertTrue(all(len(round_logs) == 1 for round_logs in mc.results))
+
+    def test_parallel_run_is_rejected(self):
+        with self.assertRaises(ValueError):
+            MonteCarlo(self.players, 4, profiler=GameProfiler()).run_simulation(workers=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
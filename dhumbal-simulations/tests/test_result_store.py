@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from conftest import make_players
+from montecarlo import MonteCarlo
+from result_store import ResultStore
+from trueskill_dhumbal import TrueskillDhumbal
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'store')
+        self.players = make_players()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        in_memory = MonteCarlo(self.players, 120)
+        in_memory.run_batch_simulation(batch_size=50, seed=9)
+        stored = MonteCarlo(self.players, 120, store=self.path)
+        stored.run_batch_simulation(batch_size=50, seed=9)
+
+        self.assertEqual(stored.results, [])
+        self.assertEqual(list(stored.iter_results()), in_memory.results)
+        self.assertEqual(list(stored.iter_results(30, 40)), in_memory.results[30:40])
+
+        # Games appended one at a time land in the same layout
+        store = ResultStore(os.path.join(self.tmp.name, 'games'), [player.name for player in stored.canonical_players()])
+        with store:
+            for round_logs in in_memory.results:
+                store.append_game(round_logs)
+        for name, column in ResultStore(self.path).columns().items():
+            self.assertIsInstance(column, np.memmap)
+            np.testing.assert_array_equal(column, store.column(name))
+
+        # Reopening the directory gives back the games, keyed by name
+        reopened = ResultStore(self.path)
+        self.assertEqual(reopened.num_games, 120)
+        first = next(reopened.iter_games())
+        self.assertEqual(first, [{p.name: data for p, data in r.items()} for r in in_memory.results[0]])
+
+    def test_analysis_from_store(self):
+        in_memory = MonteCarlo(self.players, 80)
+        in_memory.run_batch_simulation(seed=4)
+        in_memory.analyze_results()
+        stored = MonteCarlo(self.players, 80, store=self.path)
+        stored.run_batch_simulation(seed=4)
+        stored.analyze_results()
+        self.assertEqual(stored.player_position_probabilities(), in_memory.player_position_probabilities())
+
+        ratings = [TrueskillDhumbal(mc, self.players).ratings_round_outcome(20, start_index=10) for mc in (in_memory, stored)]
+        self.assertEqual(ratings[0], ratings[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import sweep
+from sweep import StrategyRace, StrategySweep, parameter_grid
+
+TABLE = [
+    ('Player 1', 'MinimizeCardNumberStrategy', {'dhumbal_threshold': 5, 'draw_graveyard_threshold': 5, 'try_to_pool_threshold': 2}),
+    ('Player 2', 'DiscardBiggestStrategy', {'dhumbal_threshold': 5, 'draw_graveyard_threshold': 5}),
+    ('Player 3', 'MinimizeCardNumberStrategy', {'dhumbal_threshold': 4, 'draw_graveyard_threshold': 4, 'try_to_pool_threshold': 3}),
+]
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parameter_grid(self):
+        self.assertEqual(parameter_grid({'a': [1, 2], 'b': [3]}), [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}])
+
+    def test_cached_rerun_and_extension(self):
+        grid = {'dhumbal_threshold': [3, 5], 'try_to_pool_threshold': [2]}
+        first = StrategySweep(TABLE, 'Player 1', grid, num_games=60, seed=1, cache_dir=self.tmp.name)
+        results = first.run()
+        self.assertEqual(first.simulated, 2)
+        self.assertEqual([cell for cell, _ in results], parameter_grid(grid))
+        self.assertEqual(len(os.listdir(self.tmp.name)), 2)
+        for _, stats in results:
+            self.assertEqual(stats['num_games'], 60)
+            self.assertAlmostEqual(sum(stats['players']['Player 1']['position_probabilities'].values()), 1.0)
+
+        # Extending the grid only simulates the new cells; the old ones come back unchanged from the cache
+        extended = StrategySweep(TABLE, 'Player 1', dict(grid, try_to_pool_threshold=[2, 4]), num_games=60, seed=1, cache_dir=self.tmp.name)
+        with mock.patch.object(sweep, 'evaluate', wraps=sweep.evaluate) as evaluate:
+            extended.run()
+        self.assertEqual(evaluate.call_count, 2)
+        self.assertEqual(extended.simulated, 2)
+        cached = {str(cell): stats for cell, stats in extended.results}
+        for cell, stats in results:
+            self.assertEqual(cached[str(cell)], stats)
+
+        # A different seed or game count is a different configuration
+        first_key = sweep.config_key(TABLE, 60, 1)
+        self.assertNotEqual(sweep.config_key(TABLE, 60, 1), sweep.config_key(TABLE, 60, 2))
+        self.assertNotEqual(sweep.config_key(TABLE, 60, 1), sweep.config_key(TABLE, 61, 1))
+        # So is a different table rule; spelling out a default is not
+        self.assertNotEqual(sweep.config_key(TABLE, 60, 1), sweep.config_key(TABLE, 60, 1, {'decks': 2}))
+        self.assertEqual(sweep.config_key(TABLE, 60, 1), sweep.config_key(TABLE, 60, 1, {'decks': 1}))
+        with mock.patch.object(sweep, 'CACHE_VERSION', sweep.CACHE_VERSION + 1):
+            self.assertNotEqual(sweep.config_key(TABLE, 60, 1), first_key)
+
+    def test_game_options(self):
+        grid = {'dhumbal_threshold': [3, 5]}
+        rules = {'hand_size': 6, 'elimination_score': 60}
+        results = StrategySweep(TABLE, 'Player 1', grid, num_games=30, seed=2, cache_dir=self.tmp.name, game_options=rules).run()
+        for cell, stats in results:
+            table = [(name, strategy, dict(params, **cell) if name == 'Player 1' else params) for name, strategy, params in TABLE]
+            self.assertEqual(stats['players'], sweep.evaluate(table, 30, 2, rules)['players'])
+        default = StrategySweep(TABLE, 'Player 1', grid, num_games=30, seed=2, cache_dir=self.tmp.name)
+        default.run()
+        self.assertEqual(default.simulated, 2)
+
+    def test_parallel_matches_serial(self):
+        grid = {'dhumbal_threshold': [3, 4, 5]}
+        serial = StrategySweep(TABLE, 'Player 2', grid, num_games=40, seed=3, cache_dir=os.path.join(self.tmp.name, 'serial')).run()
+        parallel = StrategySweep(TABLE, 'Player 2', grid, num_games=40, seed=3, cache_dir=os.path.join(self.tmp.name, 'parallel'), workers=2).run()
+        self.assertEqual(serial, parallel)
+
+
+    def test_race_halves_the_field(self):
+        grid = {'dhumbal_threshold': [0, 2, 4, 6], 'draw_graveyard_threshold': [2, 6]}
+        # With a vanishing confidence interval only the best half go on, and the race stops as soon as
+        # one configuration is left instead of playing it another rung
+        race = StrategyRace(TABLE, 'Player 1', grid, min_games=40, eta=2, confidence=1e-9, seed=1, cache_dir=self.tmp.name)
+        results = race.run()
+        self.assertEqual([len(rung) for rung in race.history], [8, 4, 2])
+        self.assertEqual([games for _, games, _, _ in race.history[-1]], [160, 160])
+        self.assertEqual(race.games_played, 8 * 40 + 4 * 40 + 2 * 80)
+        self.assertEqual(len(results), 2)
+        # The winner survived every rung
+        for rung in race.history:
+            self.assertIn(results[0][0], [cell for cell, _, _, _ in rung])
+
+        # Rerunning reuses every cached rung
+        with mock.patch.object(sweep, 'evaluate', wraps=sweep.evaluate) as evaluate:
+            rerun = StrategyRace(TABLE, 'Player 1', grid, min_games=40, eta=2, confidence=1e-9, seed=1, cache_dir=self.tmp.name)
+            self.assertEqual(rerun.run(), results)
+        self.assertEqual(evaluate.call_count, 0)
+
+        # max_games caps the rungs
+        capped = StrategyRace(TABLE, 'Player 1', grid, min_games=40, eta=2, max_games=100, seed=1, cache_dir=self.tmp.name)
+        self.assertEqual(len(capped.run()), 4)
+
+    def test_race_keeps_close_configurations(self):
+        grid = {'dhumbal_threshold': [0, 2, 4, 6], 'draw_graveyard_threshold': [2, 6]}
+        race = StrategyRace(TABLE, 'Player 1', grid, min_games=40, eta=2, seed=1, cache_dir=self.tmp.name)
+        race.run()
+        # A configuration outside the best half only drops out when its interval is clear of the leader's
+        for rung, next_rung in zip(race.history, race.history[1:]):
+            _, _, leader_mean, leader_error = rung[0]
+            kept = [cell for cell, _, _, _ in next_rung]
+            for cell, _, mean, error in rung[len(rung) // 2:]:
+                if cell not in kept:
+                    self.assertGreater(mean - race.z * error, leader_mean + race.z * leader_error)
+        self.assertGreater(len(race.history[-1]), 2)
+        # Without a cap, the race stops at the budget plain halving would reach
+        self.assertEqual(race.history[-1][0][1], 320)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from conftest import make_players
+from montecarlo import MonteCarlo
+from tracing import JsonlSink, RingBufferSink
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.players = make_players()
+        self.mc = MonteCarlo(self.players, 10)
+        self.mc.run_simulation(seed=6)
+
+    def test_ring_buffer_replay(self):
+        sink = RingBufferSink()
+        game = self.mc.replay_game(4, tracer=sink)
+        events = list(sink.events)
+        self.assertEqual(game.scoreboard.round_log, self.mc.results[4])
+        self.assertEqual(events[0]['event'], 'game_start')
+        self.assertEqual(events[-1]['event'], 'game_end')
+
+        # Every round is dealt, ends with a Dhumbal call and its results match the round log
+        round_ends = [event['results'] for event in events if event['event'] == 'round_end']
+        expected = [{player.name: [points, cumulative, result.name] for player, (points, cumulative, result) in round_log.items()}
+                    for round_log in self.mc.results[4]]
+        self.assertEqual(round_ends, expected)
+        self.assertEqual(sum(event['event'] == 'dhumbal' for event in events), len(expected))
+        self.assertEqual(sum(event['event'] == 'deal' for event in events), len(expected))
+        for event in events:
+            if event['event'] == 'draw':
+                self.assertIn(event['source'], ('deck', 'graveyard'))
+
+        # A small buffer keeps only the latest events
+        small = RingBufferSink(capacity=5)
+        self.mc.replay_game(4, tracer=small)
+        self.assertEqual(list(small.events), events[-5:])
+
+    def test_jsonl_sink(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'trace.jsonl')
+            with JsonlSink(path) as sink:
+                self.mc.replay_game(2, tracer=sink)
+            with open(path) as f:
+                events = [json.loads(line) for line in f]
+        ring = RingBufferSink()
+        self.mc.replay_game(2, tracer=ring)
+        self.assertEqual(events, list(ring.events))
+
+    def test_verbose_prints_events(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            mc = MonteCarlo(self.players, 1, verbose=True)
+            mc.run_simulation(seed=1)
+        self.assertIn('game_end', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from src import utils
+import utils
 
 class TestUtils(unittest.TestCase):
     def setUp(self):